@@ -1,3 +1,4 @@
 from __future__ import absolute_import
 
-from . import client, rest, session
+from . import (aio, batch, cache, client, codec, columnar, index, jsonstream, models, paging, rest, session,
+               sync, transfer, transport, walk, watcher)
@@ -0,0 +1,591 @@
+from __future__ import absolute_import
+
+import asyncio
+import copy
+import os
+import urllib.parse
+
+from . import codec, columnar, jsonstream, paging, rest, transfer, walk
+from .client import BanmayunClient, delta_cursor_id, delta_entries
+from .rest import ErrorResponse, RESTSocketError, SDK_VERSION, json_loadb
+from .transport import create_ssl_context
+
+
+class AsyncRESTResponse(object):
+    BLOCK_SIZE = 256 * 1024
+
+    def __init__(self, conn, pool, status, version, reason, headers, chunked, length):
+        self.conn = conn
+        self.pool = pool
+        self.status = status
+        self.version = version
+        self.reason = reason
+        self.headers = headers
+        self.chunked = chunked
+        self.length_remaining = length
+        self.is_closed = False
+        self._chunk_left = 0
+        self._eof = length == 0
+        self.decoder = None
+        self._decoded = bytearray()
+        self._decoded_eof = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, typ, value, traceback):
+        await self.aclose()
+
+    def __del__(self):
+        self.close()
+
+    async def read(self, amt=None):
+        if self.is_closed:
+            raise ValueError('Response already closed')
+
+        if amt is None:
+            parts = []
+            while True:
+                block = await self.read(self.BLOCK_SIZE)
+                if not block:
+                    return b''.join(parts)
+                parts.append(block)
+
+        if self.decoder is None:
+            return await self._read_raw(amt)
+
+        while len(self._decoded) < amt and not self._decoded_eof:
+            raw = await self._read_raw(self.BLOCK_SIZE)
+            if raw:
+                self._decoded += self.decoder.decompress(raw)
+            else:
+                self._decoded += self.decoder.flush()
+                self._decoded_eof = True
+        data = bytes(self._decoded[:amt])
+        del self._decoded[:amt]
+        return data
+
+    async def _read_raw(self, amt):
+        if self._eof or amt == 0:
+            return b''
+
+        reader = self.conn.reader
+        if self.chunked:
+            if self._chunk_left == 0:
+                line = await reader.readline()
+                self._chunk_left = int(line.split(b';', 1)[0].strip(), 16)
+                if self._chunk_left == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    self._eof = True
+                    return b''
+            data = await reader.read(min(amt, self._chunk_left))
+            if not data:
+                raise asyncio.IncompleteReadError(data, self._chunk_left)
+            self._chunk_left -= len(data)
+            if self._chunk_left == 0:
+                await reader.readexactly(2)
+            return data
+
+        if self.length_remaining is not None:
+            amt = min(amt, self.length_remaining)
+        data = await reader.read(amt)
+        if self.length_remaining is not None:
+            if not data:
+                raise asyncio.IncompleteReadError(data, self.length_remaining)
+            self.length_remaining -= len(data)
+            self._eof = self.length_remaining == 0
+        elif not data:
+            self._eof = True
+        return data
+
+    async def readinto(self, b):
+        data = await self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    async def iter_chunks(self, chunk_size=BLOCK_SIZE):
+        while True:
+            block = await self.read(chunk_size)
+            if not block:
+                return
+            yield block
+
+    async def aclose(self):
+        if self.is_closed:
+            return
+
+        try:
+            while await self._read_raw(self.BLOCK_SIZE):
+                pass
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        self.close()
+
+    def close(self):
+        if self.is_closed:
+            return
+
+        self.is_closed = True
+        reusable = self._eof and (self.chunked or self.length_remaining is not None) and \
+            self.headers.get('connection', '').lower() != 'close'
+        self.pool.release(self.conn, reusable)
+
+    @property
+    def closed(self):
+        return self.is_closed
+
+    def getheaders(self):
+        return dict(self.headers)
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+
+class _Connection(object):
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+        self.on_release = None
+
+
+class _ConnectionPool(object):
+    def __init__(self, max_connections, connect_timeout, ssl_context):
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.ssl_context = ssl_context
+        self._idle = {}
+        self._semaphores = {}
+
+    async def acquire(self, key, fresh=False):
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self.max_connections)
+        await semaphore.acquire()
+
+        try:
+            idle = self._idle.get(key)
+            while idle and not fresh:
+                conn = idle.pop()
+                if not conn.reader.at_eof() and not conn.writer.is_closing():
+                    conn.reused = True
+                    return conn
+                conn.writer.close()
+
+            scheme, host, port = key
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port, ssl=self.ssl_context if scheme == 'https' else None),
+                self.connect_timeout)
+            return _Connection(key, reader, writer)
+        except BaseException:
+            semaphore.release()
+            raise
+
+    def release(self, conn, reusable):
+        if conn.on_release is not None:
+            on_release, conn.on_release = conn.on_release, None
+            on_release()
+        if reusable:
+            self._idle.setdefault(conn.key, []).append(conn)
+        else:
+            conn.writer.close()
+        self._semaphores[conn.key].release()
+
+    async def close(self):
+        idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.writer.close()
+
+
+class AsyncRESTClientObject(object):
+    def __init__(self, max_connections=100, connect_timeout=10.0, read_timeout=60.0, ssl_context=None,
+                 retry_policy=None, rate_limiter=None, accept_encoding=True, compress_requests=False,
+                 compress_min_size=1024):
+        self.read_timeout = read_timeout
+        self.accept_encoding = accept_encoding
+        self.compress_min_size = compress_min_size if compress_requests else None
+        self.retry_policy = retry_policy if retry_policy is not None else rest.RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self._semaphores = {}
+        if ssl_context is None:
+            ssl_context = create_ssl_context()
+        self.pool = _ConnectionPool(max_connections, connect_timeout, ssl_context)
+
+    async def close(self):
+        await self.pool.close()
+
+    async def request(self, method, url, headers=None, body=None, raw_response=False):
+        headers = headers or {}
+        headers['User-Agent'] = 'OfficialBanmayunPythonSDK/' + SDK_VERSION
+
+        body = rest.encode_request(url, headers, body, self.accept_encoding, self.compress_min_size)
+        body, content_length = rest.prepare_body(body)
+        if isinstance(body, str):
+            body = body.encode('utf8')
+        if isinstance(body, bytes):
+            content_length = len(body)
+
+        for key, value in headers.items():
+            if isinstance(value, str) and '\n' in value:
+                raise ValueError("headers should not contain newlines (%s: %s)" %
+                                 (key, value))
+
+        if content_length is not None:
+            headers['Content-Length'] = str(content_length)
+        elif body is not None:
+            headers['Transfer-Encoding'] = 'chunked'
+        elif method in ('POST', 'PUT'):
+            headers['Content-Length'] = '0'
+
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = parts.path + ('?' + parts.query if parts.query else '')
+        head = ["%s %s HTTP/1.1" % (method, target), "Host: %s" % parts.netloc]
+        head.extend("%s: %s" % (k, v) for k, v in headers.items())
+        head = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+        policy = self.retry_policy
+        limiter = self.rate_limiter
+        endpoint_class = limiter.classify(method, url) if limiter is not None else None
+        rewind = rest.rewind_body(body)
+        policy.started()
+        attempt = 0
+        fresh = False
+        while True:
+            release = await self._throttle(endpoint_class)
+            try:
+                conn = await self.pool.acquire(key, fresh)
+            except (OSError, asyncio.TimeoutError) as e:
+                if release is not None:
+                    release()
+                if rewind is None or not policy.should_retry(method, url, attempt, sent=False):
+                    raise RESTSocketError(url, e)
+                await asyncio.sleep(policy.delay(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                if release is not None:
+                    release()
+                raise
+
+            conn.on_release = release
+            fresh = False
+            sent = False
+            try:
+                await self._send(conn, head, body, content_length)
+                sent = True
+                r = await asyncio.wait_for(self._read_head(conn), self.read_timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                self.pool.release(conn, False)
+                if rewind is None or not policy.should_retry(method, url, attempt, sent=sent):
+                    raise RESTSocketError(url, e)
+                if conn.reused and not isinstance(e, asyncio.TimeoutError):
+                    # the server dropped an idle keep-alive connection, so replay at once on a new one
+                    fresh = True
+                else:
+                    await asyncio.sleep(policy.delay(attempt))
+                attempt += 1
+                body = rewind()
+                continue
+            except BaseException:
+                self.pool.release(conn, False)
+                raise
+
+            if limiter is not None:
+                limiter.observe(endpoint_class, r.status)
+
+            if r.status != 200:
+                if rewind is not None and policy.should_retry(method, url, attempt, status=r.status):
+                    retry_after = rest.parse_retry_after(r.getheader('retry-after'))
+                    await r.aclose()
+                    await asyncio.sleep(policy.delay(attempt, retry_after))
+                    body = rewind()
+                    attempt += 1
+                    continue
+                raise ErrorResponse(r, await self._read_body(r, url))
+
+            return await self.process_response(r, raw_response, url)
+
+    async def _throttle(self, endpoint_class):
+        if endpoint_class is None:
+            return None
+
+        delay = self.rate_limiter.reserve(endpoint_class)
+        if delay:
+            await asyncio.sleep(delay)
+
+        limit = self.rate_limiter.max_in_flight.get(endpoint_class)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(endpoint_class)
+        if semaphore is None:
+            semaphore = self._semaphores[endpoint_class] = asyncio.Semaphore(limit)
+        await semaphore.acquire()
+        return semaphore.release
+
+    async def _send(self, conn, head, body, content_length):
+        writer = conn.writer
+        writer.write(head)
+        if body is None:
+            pass
+        elif isinstance(body, (bytes, memoryview)):
+            writer.write(body)
+        elif hasattr(body, 'read'):
+            while True:
+                block = body.read(AsyncRESTResponse.BLOCK_SIZE)
+                if not block:
+                    break
+                self._write_block(writer, block, content_length)
+                await writer.drain()
+        elif hasattr(body, '__aiter__'):
+            async for block in body:
+                self._write_block(writer, block, content_length)
+                await writer.drain()
+        else:
+            for block in body:
+                self._write_block(writer, block, content_length)
+                await writer.drain()
+        if body is not None and content_length is None:
+            writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    @staticmethod
+    def _write_block(writer, block, content_length):
+        if isinstance(block, str):
+            block = block.encode('utf8')
+        if content_length is None:
+            writer.write(b'%x\r\n' % len(block))
+            writer.write(block)
+            writer.write(b'\r\n')
+        else:
+            writer.write(block)
+
+    async def _read_head(self, conn):
+        while True:
+            line = await conn.reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(line, None)
+            version, status, reason = (line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+
+            headers = {}
+            while True:
+                line = await conn.reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if not 100 <= int(status) < 200:
+                break
+
+        chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+        length = None
+        if not chunked and 'content-length' in headers:
+            length = int(headers['content-length'])
+        r = AsyncRESTResponse(conn, self.pool, int(status), version, reason, headers, chunked, length)
+        encoding = headers.get('content-encoding', 'identity')
+        if encoding.lower() != 'identity':
+            r.decoder = rest.StreamDecoder(encoding)
+        return r
+
+    async def _read_body(self, r, url):
+        try:
+            return await asyncio.wait_for(r.read(), self.read_timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            r.is_closed = True
+            self.pool.release(r.conn, False)
+            raise RESTSocketError(url, e)
+
+    async def process_response(self, r, raw_response, url=None):
+        if raw_response:
+            return r
+
+        s = await self._read_body(r, url)
+        try:
+            resp = json_loadb(s)
+        except ValueError:
+            raise ErrorResponse(r, s)
+        r.close()
+        return resp
+
+    async def GET(self, url, headers=None, raw_response=False):
+        assert type(raw_response) == bool
+        return await self.request("GET", url, headers=headers, raw_response=raw_response)
+
+    async def POST(self, url, headers=None, body=None, raw_response=False):
+        assert type(raw_response) == bool
+        return await self.request("POST", url, headers=headers, body=body, raw_response=raw_response)
+
+    async def PUT(self, url, headers=None, body=None, raw_response=False):
+        assert type(raw_response) == bool
+        return await self.request("PUT", url, headers=headers, body=body, raw_response=raw_response)
+
+    async def DELETE(self, url, headers=None, raw_response=False):
+        assert type(raw_response) == bool
+        return await self.request("DELETE", url, headers=headers, raw_response=raw_response)
+
+
+class AsyncBanmayunClient(BanmayunClient):
+    _iter_pages = staticmethod(paging.aiter_pages)
+
+    def __init__(self, session, rest_client=None):
+        super().__init__(session)
+        self.rest_client = rest_client or AsyncRESTClientObject()
+
+    async def close(self):
+        await self.rest_client.close()
+
+    def streaming(self, key='entries', block_size=jsonstream.BLOCK_SIZE):
+        streaming = copy.copy(self)
+        streaming.rest_client = jsonstream.AsyncStreamingRESTClient(self.rest_client, key, block_size)
+        streaming.meta_cache = None
+        return streaming
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, typ, value, traceback):
+        await self.close()
+
+    def list_all(self, list_method, *args, page_size=paging.PAGE_SIZE, max_workers=4, **kwargs):
+        if isinstance(list_method, str):
+            list_method = getattr(self, list_method)
+        return paging.aiter_pages_concurrently(list_method, *args, page_size=page_size,
+                                               max_workers=max_workers, **kwargs)
+
+    async def collect(self, list_method, *args, columns=None, page_size=paging.PAGE_SIZE, **kwargs):
+        if isinstance(list_method, str):
+            list_method = getattr(self, list_method)
+        name = getattr(list_method, '__name__', '')
+        result = columnar.ColumnarResult(self._collect_columns(name, columns))
+
+        if name == 'list_folder':
+            return result.extend(paging.page_entries(await list_method(*args, **kwargs)))
+        async for entry in paging.aiter_pages(list_method, *args, page_size=page_size, **kwargs):
+            result.append(entry)
+        return result
+
+    async def collect_delta(self, root_id, cursor_id=None, columns=columnar.META_COLUMNS):
+        result = columnar.ColumnarResult(columns)
+        while True:
+            delta = await self.delta(root_id, cursor_id)
+            if delta.get('reset'):
+                result = columnar.ColumnarResult(columns)
+            columnar.collect_delta(delta_entries(delta), result=result)
+            cursor_id = delta_cursor_id(delta)
+            if not delta.get('has_more'):
+                return result, cursor_id
+
+    def walk(self, root_id, full_path, max_workers=8, max_depth=None, include=None, exclude=None):
+        return walk.awalk(self, root_id, full_path, max_workers=max_workers, max_depth=max_depth,
+                          include=include, exclude=exclude)
+
+    async def put_file_by_path(self, root_id, full_path, file_obj, modified_at_millis, overwrite=False):
+        if isinstance(file_obj, str):
+            with transfer.MappedFile(file_obj) as f:
+                return await super().put_file_by_path(root_id, full_path, f, modified_at_millis, overwrite)
+
+        return await super().put_file_by_path(root_id, full_path, file_obj, modified_at_millis, overwrite)
+
+    async def download_to(self, root_id, full_path, dest, version=None, offset=None, bytes_=None,
+                          buffer_size=BanmayunClient.DOWNLOAD_BUFFER_SIZE):
+        if isinstance(dest, str):
+            with open(dest, 'wb') as f:
+                return await self.download_to(root_id, full_path, f, version, offset, bytes_, buffer_size)
+
+        resp = await self.get_file_by_path(root_id, full_path, version=version, offset=offset, bytes_=bytes_)
+        try:
+            header = resp.getheader('x-banmayun-meta')
+            try:
+                meta = codec.loadb(header) if header else None
+            except ValueError:
+                meta = None
+            if not meta:
+                raise ErrorResponse(resp, await resp.read())
+
+            async for block in resp.iter_chunks(buffer_size):
+                dest.write(block)
+        finally:
+            await resp.aclose()
+        return meta
+
+    async def upload(self, root_id, full_path, source, modified_at_millis=None, overwrite=False,
+                     chunked_threshold=BanmayunClient.CHUNKED_UPLOAD_THRESHOLD, uploader=None,
+                     chunk_size=transfer.ChunkedUploader.CHUNK_SIZE, max_workers=4):
+        if uploader is not None:
+            # ChunkedUploader drives its chunks from threads; here they run as tasks on the event loop
+            raise TypeError("AsyncBanmayunClient.upload does not take an uploader; "
+                            "pass chunk_size and max_workers instead")
+
+        if isinstance(source, str):
+            with transfer.MappedFile(source) as f:
+                if modified_at_millis is None:
+                    modified_at_millis = int(os.fstat(f.fileno()).st_mtime * 1000)
+                return await self.upload(root_id, full_path, f, modified_at_millis, overwrite,
+                                         chunked_threshold, chunk_size=chunk_size, max_workers=max_workers)
+
+        if modified_at_millis is None:
+            modified_at_millis = transfer.now_millis()
+
+        if not overwrite:
+            await self._check_absent(root_id, full_path)
+
+        start = source.tell()
+        md5, size = await asyncio.get_running_loop().run_in_executor(None, transfer.file_md5, source)
+        try:
+            return await self.thunder_upload(root_id, full_path, md5, size, modified_at_millis)
+        except ErrorResponse as e:
+            if e.status != 404:
+                raise
+
+        source.seek(start)
+        if size < chunked_threshold:
+            return await self.put_file_by_path(root_id, full_path, source, modified_at_millis, overwrite)
+        return await self.upload_chunks(root_id, full_path, source, modified_at_millis, chunk_size,
+                                        max_workers)
+
+    async def upload_chunks(self, root_id, full_path, source, modified_at_millis,
+                            chunk_size=transfer.ChunkedUploader.CHUNK_SIZE, max_workers=4):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        chunk = source.read(chunk_size)
+        upload_id = (await self.chunked_upload(chunk))['id']
+        offset = len(chunk)
+        pending = set()
+        try:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                while len(pending) >= max_workers:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(asyncio.ensure_future(self.chunked_upload(chunk, upload_id, offset)))
+                offset += len(chunk)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+        return await self.commit_chunked_upload(root_id, full_path, upload_id, modified_at_millis)
+
+    async def _check_absent(self, root_id, full_path):
+        try:
+            meta = await self.get_meta(root_id, full_path)
+        except ErrorResponse as e:
+            if e.status != 404:
+                raise
+            return
+        if meta and not meta.get('is_deleted'):
+            raise transfer.TargetExistsError(full_path, meta)
@@ -0,0 +1,154 @@
+from __future__ import absolute_import
+
+import inspect
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .client import format_path
+
+PATH_ARGUMENTS = ('full_path', 'to_full_path')
+
+
+class DependencyFailedError(Exception):
+    def __init__(self, dependency):
+        Exception.__init__(self, "dependency %r did not succeed" % (dependency,))
+        self.dependency = dependency
+
+
+class Operation(object):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, method, *args, depends_on=(), **kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.depends_on = list(depends_on)
+        self.status = Operation.PENDING
+        self.result = None
+        self.error = None
+
+    def __repr__(self):
+        args = [repr(a) for a in self.args] + ["%s=%r" % item for item in self.kwargs.items()]
+        return "Operation(%r, %s)" % (self.method, ", ".join(args))
+
+
+class BatchResult(object):
+    def __init__(self, operations, elapsed):
+        self.operations = operations
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return [op for op in self.operations if op.status == Operation.DONE]
+
+    @property
+    def failed(self):
+        return [op for op in self.operations if op.status in (Operation.FAILED, Operation.SKIPPED)]
+
+    @property
+    def ops_per_second(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.operations) / self.elapsed
+
+    def __repr__(self):
+        return "BatchResult(succeeded=%d, failed=%d, elapsed=%.3f)" % \
+               (len(self.succeeded), len(self.failed), self.elapsed)
+
+
+class BatchExecutor(object):
+    def __init__(self, client, max_workers=8):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        self.client = client
+        self.max_workers = max_workers
+
+    def _paths(self, op):
+        try:
+            bound = inspect.signature(getattr(self.client, op.method)).bind(*op.args, **op.kwargs)
+        except (AttributeError, TypeError):
+            return None, ()
+        arguments = bound.arguments
+        paths = [(format_path(arguments[name]) or '').lower() for name in PATH_ARGUMENTS
+                 if arguments.get(name) is not None]
+        return arguments.get('root_id'), paths
+
+    def _infer_dependencies(self, operations):
+        folders = {}
+        targets = []
+        for op in operations:
+            root_id, paths = self._paths(op)
+            targets.append((root_id, paths))
+            if op.method == 'create_folder' and paths:
+                folders[(root_id, paths[0])] = op
+
+        for op, (root_id, paths) in zip(operations, targets):
+            for path in paths[-1:]:
+                parent = path.rsplit('/', 1)[0]
+                while parent:
+                    folder = folders.get((root_id, parent))
+                    if folder is not None and folder is not op:
+                        if folder not in op.depends_on:
+                            op.depends_on.append(folder)
+                        break
+                    parent = parent.rsplit('/', 1)[0]
+
+    def run(self, operations):
+        operations = list(operations)
+        self._infer_dependencies(operations)
+
+        index = set(id(op) for op in operations)
+        waiting = {}
+        dependents = {}
+        for op in operations:
+            deps = [dep for dep in op.depends_on if id(dep) in index]
+            waiting[id(op)] = len(deps)
+            for dep in deps:
+                dependents.setdefault(id(dep), []).append(op)
+
+        started_at = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+
+            def submit(op):
+                pending[executor.submit(self._call, op)] = op
+
+            def settle(op):
+                for child in dependents.get(id(op), ()):
+                    if op.status != Operation.DONE:
+                        if child.status == Operation.PENDING:
+                            child.status = Operation.SKIPPED
+                            child.error = DependencyFailedError(op)
+                            settle(child)
+                        continue
+                    waiting[id(child)] -= 1
+                    if waiting[id(child)] == 0 and child.status == Operation.PENDING:
+                        submit(child)
+
+            for op in operations:
+                if waiting[id(op)] == 0:
+                    submit(op)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    settle(pending.pop(future))
+
+        for op in operations:
+            if op.status == Operation.PENDING:
+                op.status = Operation.SKIPPED
+                op.error = DependencyFailedError(None)
+
+        return BatchResult(operations, time.time() - started_at)
+
+    def _call(self, op):
+        try:
+            op.result = getattr(self.client, op.method)(*op.args, **op.kwargs)
+            op.status = Operation.DONE
+        except Exception as e:
+            op.error = e
+            op.status = Operation.FAILED
@@ -0,0 +1,134 @@
+from __future__ import absolute_import
+
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+
+def _copy(value):
+    # cached metas are handed out as fresh containers so callers cannot mutate the shared entry
+    if isinstance(value, dict):
+        return dict((key, _copy(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _parent(path):
+    if not path:
+        return None
+    return path.rsplit('/', 1)[0]
+
+
+class MetaCache(object):
+    def __init__(self, max_entries=10000, ttl=None):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # per-root sorted paths and the kinds cached for each, so invalidation never scans the whole cache
+        self._paths = {}
+        self._kinds = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(root_id, path, kind):
+        return root_id, (path or '').lower(), kind
+
+    def get(self, root_id, path, kind):
+        key = self._key(root_id, path, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_path, expires_at = entry
+                if stored_path == path and (expires_at is None or expires_at > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _copy(value)
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, root_id, path, kind, value):
+        key = self._key(root_id, path, kind)
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key not in self._entries:
+                self._add(key)
+            self._entries[key] = (_copy(value), path, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _add(self, key):
+        root_id, path, kind = key
+        kinds = self._kinds.get((root_id, path))
+        if kinds is None:
+            kinds = self._kinds[root_id, path] = set()
+            insort(self._paths.setdefault(root_id, []), path)
+        kinds.add(kind)
+
+    def _remove(self, key):
+        root_id, path, kind = key
+        del self._entries[key]
+        kinds = self._kinds[root_id, path]
+        kinds.discard(kind)
+        if not kinds:
+            del self._kinds[root_id, path]
+            paths = self._paths[root_id]
+            del paths[bisect_left(paths, path)]
+            if not paths:
+                del self._paths[root_id]
+
+    def _remove_path(self, root_id, path, keep=()):
+        kinds = self._kinds.get((root_id, path))
+        if kinds is not None:
+            for kind in [kind for kind in kinds if kind not in keep]:
+                self._remove((root_id, path, kind))
+
+    def invalidate(self, root_id, path, recursive=False):
+        lower = (path or '').lower()
+        parent = _parent(lower)
+        with self._lock:
+            self._remove_path(root_id, lower)
+            if parent is not None:
+                self._remove_path(root_id, parent, keep=('meta',))
+            paths = self._paths.get(root_id)
+            if recursive and paths:
+                # '0' sorts right after '/', so the slice holds exactly the cached descendants
+                low = bisect_left(paths, lower + '/')
+                high = bisect_left(paths, lower + '0', low)
+                for descendant in paths[low:high]:
+                    for kind in self._kinds.pop((root_id, descendant)):
+                        del self._entries[root_id, descendant, kind]
+                del paths[low:high]
+                if not paths:
+                    del self._paths[root_id]
+
+    def invalidate_root(self, root_id):
+        with self._lock:
+            for path in self._paths.pop(root_id, ()):
+                for kind in self._kinds.pop((root_id, path)):
+                    del self._entries[root_id, path, kind]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+            self._kinds.clear()
+
+    def apply_delta(self, root_id, entries, reset=False):
+        if reset:
+            self.invalidate_root(root_id)
+            return
+
+        for path, meta in entries:
+            self.invalidate(root_id, path, recursive=meta is None or bool(meta.get('is_dir')))
+
+    def __len__(self):
+        return len(self._entries)
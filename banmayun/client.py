@@ -1,8 +1,10 @@
 from __future__ import absolute_import
 
-import json
+import copy
+import os
 import re
 
+from . import codec, columnar, jsonstream, paging, transfer, walk
 from .rest import ErrorResponse
 
 
@@ -18,10 +20,53 @@ def format_path(path):
         return '/' + path.strip('/')
 
 
+def delta_entries(delta):
+    for entry in delta.get('entries') or []:
+        if isinstance(entry, dict):
+            yield entry.get('path'), entry.get('meta')
+        else:
+            yield entry[0], entry[1]
+
+
+def delta_cursor_id(delta):
+    cursor = delta.get('cursor')
+    if isinstance(cursor, dict):
+        return cursor.get('id')
+    return delta.get('cursor_id', cursor)
+
+
 class BanmayunClient(object):
-    def __init__(self, session):
+    CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+    DOWNLOAD_BUFFER_SIZE = 256 * 1024
+    COLLECT_COLUMNS = {
+        'list_folder': columnar.META_COLUMNS,
+        'list_revisions_for_file': columnar.META_COLUMNS,
+        'search_files': columnar.META_COLUMNS,
+        'top_files': columnar.META_COLUMNS,
+        'list_users': columnar.USER_COLUMNS,
+        'list_users_for_group': columnar.USER_COLUMNS,
+        'search_users': columnar.USER_COLUMNS,
+        'top_users': columnar.USER_COLUMNS,
+        'list_groups': columnar.GROUP_COLUMNS,
+        'list_groups_for_user': columnar.GROUP_COLUMNS,
+        'search_groups': columnar.GROUP_COLUMNS,
+        'top_groups': columnar.GROUP_COLUMNS,
+        'list_links_for_user': columnar.LINK_COLUMNS,
+        'list_comments': columnar.COMMENT_COLUMNS,
+        'list_comments_for_root': columnar.COMMENT_COLUMNS,
+        'list_comments_for_meta': columnar.COMMENT_COLUMNS,
+        'list_shares': columnar.SHARE_COLUMNS,
+        'list_shares_for_root': columnar.SHARE_COLUMNS,
+        'list_shares_for_meta': columnar.SHARE_COLUMNS,
+        'list_trashes_for_root': columnar.TRASH_COLUMNS,
+    }
+
+    _iter_pages = staticmethod(paging.iter_pages)
+
+    def __init__(self, session, meta_cache=None):
         self.session = session
         self.rest_client = session.rest_client
+        self.meta_cache = meta_cache
 
     def get_session(self):
         return self.session
@@ -39,6 +84,47 @@ class BanmayunClient(object):
     def get_current_user_id(self):
         return self.session.link["user_id"]
 
+    def list_all(self, list_method, *args, page_size=paging.PAGE_SIZE, max_workers=4, **kwargs):
+        if isinstance(list_method, str):
+            list_method = getattr(self, list_method)
+        return paging.iter_pages_concurrently(list_method, *args, page_size=page_size,
+                                              max_workers=max_workers, **kwargs)
+
+    def collect(self, list_method, *args, columns=None, page_size=paging.PAGE_SIZE, **kwargs):
+        if isinstance(list_method, str):
+            list_method = getattr(self, list_method)
+        name = getattr(list_method, '__name__', '')
+        columns = self._collect_columns(name, columns)
+
+        if name == 'list_folder':
+            return columnar.collect(paging.page_entries(list_method(*args, **kwargs)), columns)
+        return columnar.collect(paging.iter_pages(list_method, *args, page_size=page_size, **kwargs), columns)
+
+    def _collect_columns(self, name, columns):
+        if columns is not None:
+            return columns
+        try:
+            return self.COLLECT_COLUMNS[name]
+        except KeyError:
+            raise ValueError("no default columns for %r; pass columns explicitly" % name)
+
+    def collect_delta(self, root_id, cursor_id=None, columns=columnar.META_COLUMNS):
+        result = columnar.ColumnarResult(columns)
+        while True:
+            delta = self.delta(root_id, cursor_id)
+            if delta.get('reset'):
+                result = columnar.ColumnarResult(columns)
+            columnar.collect_delta(delta_entries(delta), result=result)
+            cursor_id = delta_cursor_id(delta)
+            if not delta.get('has_more'):
+                return result, cursor_id
+
+    def streaming(self, key='entries', block_size=jsonstream.BLOCK_SIZE):
+        streaming = copy.copy(self)
+        streaming.rest_client = jsonstream.StreamingRESTClient(self.rest_client, key, block_size)
+        streaming.meta_cache = None
+        return streaming
+
     def get_link(self, user_id, link_id):
         path = "/users/%s/links/%s" % (user_id, link_id)
 
@@ -57,6 +143,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_links_for_user(self, user_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_links_for_user, user_id, page_size=page_size, prefetch=prefetch)
+
     def delete_link(self, user_id, link_id):
         path = "/users/%s/links/%s" % (user_id, link_id)
 
@@ -74,7 +163,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(user))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(user))
 
     def create_user(self, user, password):
         path = "/users"
@@ -82,7 +171,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(user))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(user))
 
     def get_user(self, user_id):
         path = "/users/%s" % user_id
@@ -108,12 +197,17 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_users(self, role=None, is_activated=None, is_blocked=None,
+                   page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_users, role, is_activated, is_blocked,
+                                page_size=page_size, prefetch=prefetch)
+
     def update_user(self, user_id, update):
         path = "/users/%s/update" % user_id
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(update))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(update))
 
     def set_user_avatar(self, user_id, avatar_data):
         path = "/users/%s/avatar" % user_id
@@ -136,7 +230,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(relation))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(relation))
 
     def get_user_group(self, user_id, group_id):
         path = "/users/%s/groups/%s" % (user_id, group_id)
@@ -163,12 +257,17 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_groups_for_user(self, user_id, role=None, is_activated=None, is_blocked=None,
+                             page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_groups_for_user, user_id, role, is_activated, is_blocked,
+                                page_size=page_size, prefetch=prefetch)
+
     def update_user_group(self, user_id, group_id, update):
         path = "/users/%s/groups/%s/update" % (user_id, group_id)
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(update))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(update))
 
     def remove_user_group(self, user_id, group_id):
         path = "/users/%s/groups/%s" % (user_id, group_id)
@@ -181,7 +280,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(group))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(group))
 
     def create_group(self, group, owner_id=None):
         path = "/groups"
@@ -192,7 +291,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(group))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(group))
 
     def get_group(self, group_id):
         path = "/groups/%s" % group_id
@@ -218,12 +317,17 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_groups(self, type_=None, is_activated=None, is_blocked=None,
+                    page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_groups, type_, is_activated, is_blocked,
+                                page_size=page_size, prefetch=prefetch)
+
     def update_group(self, group_id, update):
         path = "/groups/%s" % group_id
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(update))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(update))
 
     def delete_group(self, group_id):
         path = "/groups/%s" % group_id
@@ -252,7 +356,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(relation))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(relation))
 
     def get_group_user(self, group_id, user_id):
         path = "/groups/%s/users/%s" % (group_id, user_id)
@@ -279,12 +383,17 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_users_for_group(self, group_id, role=None, is_activated=None, is_blocked=None,
+                             page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_users_for_group, group_id, role, is_activated, is_blocked,
+                                page_size=page_size, prefetch=prefetch)
+
     def update_group_user(self, group_id, user_id, update):
         path = "/groups/%s/users/%s/update" % (group_id, user_id)
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(update))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(update))
 
     def remove_group_user(self, group_id, user_id):
         path = "/groups/%s/users/%s" % (group_id, user_id)
@@ -303,7 +412,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(default_permission))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(default_permission))
 
     def set_root_quota(self, root_id, quota):
         path = "/roots/%s/default_permission" % root_id
@@ -314,12 +423,18 @@ class BanmayunClient(object):
         return self.rest_client.POST(url, headers=headers)
 
     def put_file_by_path(self, root_id, full_path, file_obj, modified_at_millis, overwrite=False):
+        if isinstance(file_obj, str):
+            with transfer.MappedFile(file_obj) as f:
+                return self.put_file_by_path(root_id, full_path, f, modified_at_millis, overwrite)
+
         path = "/roots/%s/files/p/%s" % (root_id, format_path(full_path))
         params = {'modified_at_millis': modified_at_millis,
                   'overwrite': overwrite}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.PUT(url, headers=headers, body=file_obj)
+        result = self.rest_client.PUT(url, headers=headers, body=file_obj)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def get_file_by_path(self, root_id, full_path, version=None, offset=None, bytes_=None):
         path = "/roots/%s/files/p/%s" % (root_id, format_path(full_path))
@@ -335,18 +450,42 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers, raw_response=True)
 
+    def download_to(self, root_id, full_path, dest, version=None, offset=None, bytes_=None,
+                    buffer_size=DOWNLOAD_BUFFER_SIZE):
+        if isinstance(dest, str):
+            with open(dest, 'wb') as f:
+                return self.download_to(root_id, full_path, f, version, offset, bytes_, buffer_size)
+
+        resp = self.get_file_by_path(root_id, full_path, version=version, offset=offset, bytes_=bytes_)
+        try:
+            meta = self.__parse_meta_as_dict(resp)
+            buf = bytearray(buffer_size)
+            view = memoryview(buf)
+            while True:
+                n = resp.readinto(buf)
+                if not n:
+                    break
+                dest.write(view[:n])
+        finally:
+            resp.close()
+        return meta
+
     def trash_file_by_path(self, root_id, full_path):
         path = "/roots/%s/files/p/%s" % (root_id, format_path(full_path))
 
         url, params, headers = self.request(path)
-        return self.rest_client.DELETE(url, headers=headers)
+        result = self.rest_client.DELETE(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def upload_file(self, root_id, meta_id, file_obj, modified_at_millis):
         path = "/roots/%s/files/%s" % (root_id, meta_id)
         params = {'modified_at_millis': modified_at_millis}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers, body=file_obj)
+        result = self.rest_client.POST(url, headers=headers, body=file_obj)
+        self._cache_invalidate_meta(root_id, result)
+        return result
 
     def get_file(self, root_id, meta_id, version=None, offset=None, bytes_=None):
         path = "/roots/%s/files/%s" % (root_id, meta_id)
@@ -366,7 +505,9 @@ class BanmayunClient(object):
         path = "/roots/%s/files/%s" % (root_id, meta_id)
 
         url, params, headers = self.request(path)
-        return self.rest_client.DELETE(url, headers=headers, raw_response=True)
+        result = self.rest_client.DELETE(url, headers=headers, raw_response=True)
+        self._cache_invalidate_meta(root_id, None)
+        return result
 
     def get_file_thumbnail(self, root_id, meta_id, format_='png', size='m'):
         path = "/roots/%s/files/%s/thumbnail" % (root_id, meta_id)
@@ -383,17 +524,21 @@ class BanmayunClient(object):
         if offset is not None:
             params['offset'] = offset
         if limit is not None:
-            limit['limit'] = limit
+            params['limit'] = limit
 
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_revisions_for_file(self, root_id, meta_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_revisions_for_file, root_id, meta_id,
+                                page_size=page_size, prefetch=prefetch)
+
     def create_comment(self, root_id, meta_id, comment):
         path = "/roots/%s/files/%s/comments" % (root_id, meta_id)
 
         url, params, headers = self.request(path)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(comment))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(comment))
 
     def get_comment(self, root_id, meta_id, comment_id):
         path = "/roots/%s/files/%s/comments/%s" % (root_id, meta_id, comment_id)
@@ -413,6 +558,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_comments(self, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_comments, page_size=page_size, prefetch=prefetch)
+
     def list_comments_for_root(self, root_id, offset=None, limit=None):
         path = "/roots/%s/files/all/comments" % root_id
 
@@ -425,6 +573,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_comments_for_root(self, root_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_comments_for_root, root_id, page_size=page_size, prefetch=prefetch)
+
     def list_comments_for_meta(self, root_id, meta_id, offset=None, limit=None):
         path = "/roots/%s/files/%s/comments" % (root_id, meta_id)
 
@@ -437,6 +588,10 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_comments_for_meta(self, root_id, meta_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_comments_for_meta, root_id, meta_id,
+                                page_size=page_size, prefetch=prefetch)
+
     def delete_comment(self, root_id, meta_id, comment_id):
         path = "/roots/%s/files/%s/comments/%s" % (root_id, meta_id, comment_id)
 
@@ -472,7 +627,7 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(share))
+        return self.rest_client.POST(url, headers=headers, body=codec.dumpb(share))
 
     def get_share(self, root_id, meta_id, share_id):
         path = "/roots/%s/files/%s/share/%s" % (root_id, meta_id, share_id)
@@ -492,6 +647,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_shares(self, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_shares, page_size=page_size, prefetch=prefetch)
+
     def list_shares_for_root(self, root_id, offset=None, limit=None):
         path = "/roots/%s/files/all/shares" % root_id
 
@@ -504,6 +662,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_shares_for_root(self, root_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_shares_for_root, root_id, page_size=page_size, prefetch=prefetch)
+
     def list_shares_for_meta(self, root_id, meta_id, offset=None, limit=None):
         path = "/roots/%s/files/%s/shares" % (root_id, meta_id)
 
@@ -516,6 +677,10 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_shares_for_meta(self, root_id, meta_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_shares_for_meta, root_id, meta_id,
+                                page_size=page_size, prefetch=prefetch)
+
     def delete_share(self, root_id, meta_id, share_id):
         path = "/roots/%s/files/%s/shares/%s" % (root_id, meta_id, share_id)
 
@@ -548,7 +713,9 @@ class BanmayunClient(object):
                   'modified_at_millis': modified_at_millis}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def copy_file(self, root_id, full_path, to_full_path):
         path = "/fileops/copy"
@@ -557,7 +724,9 @@ class BanmayunClient(object):
                   'to_path': format_path(to_full_path)}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, to_full_path)
+        return result
 
     def move_file(self, root_id, full_path, to_full_path):
         path = "/fileops/move"
@@ -566,7 +735,9 @@ class BanmayunClient(object):
                   'to_path': format_path(to_full_path)}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path, to_full_path)
+        return result
 
     def create_folder(self, root_id, full_path, modified_at_millis=None):
         path = "/fileops/create_folder"
@@ -577,24 +748,64 @@ class BanmayunClient(object):
             params['modified_at_millis'] = modified_at_millis
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def get_meta(self, root_id, full_path, list_=False):
+        kind = 'meta+list' if list_ else 'meta'
+        meta = self._cache_get(root_id, full_path, kind)
+        if meta is not None:
+            return meta
+
         path = "/fileops/get_meta"
         params = {'root_id': root_id,
                   'path': format_path(full_path),
                   'list': list_}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        return self._cache_put(root_id, full_path, kind, self.rest_client.POST(url, headers=headers))
 
     def list_folder(self, root_id, full_path):
+        metas = self._cache_get(root_id, full_path, 'list')
+        if metas is not None:
+            return metas
+
         path = "/fileops/list_folder"
         params = {'root_id': root_id,
                   'path': format_path(full_path)}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        return self._cache_put(root_id, full_path, 'list', self.rest_client.POST(url, headers=headers))
+
+    def _cache_get(self, root_id, full_path, kind):
+        if self.meta_cache is None:
+            return None
+        return self.meta_cache.get(root_id, format_path(full_path), kind)
+
+    def _cache_put(self, root_id, full_path, kind, value):
+        if self.meta_cache is not None:
+            self.meta_cache.put(root_id, format_path(full_path), kind, value)
+        return value
+
+    def _cache_invalidate(self, root_id, *full_paths):
+        if self.meta_cache is not None:
+            for full_path in full_paths:
+                self.meta_cache.invalidate(root_id, format_path(full_path), recursive=True)
+
+    def _cache_invalidate_meta(self, root_id, meta):
+        if self.meta_cache is None:
+            return
+        # id-based calls only know the path if the server echoes the meta back
+        path = meta.get('path') if isinstance(meta, dict) else None
+        if path:
+            self.meta_cache.invalidate(root_id, format_path(path), recursive=True)
+        else:
+            self.meta_cache.invalidate_root(root_id)
+
+    def walk(self, root_id, full_path, max_workers=8, max_depth=None, include=None, exclude=None):
+        return walk.walk(self, root_id, full_path, max_workers=max_workers, max_depth=max_depth,
+                         include=include, exclude=exclude)
 
     def rollback_file(self, root_id, full_path, to_version):
         path = "/fileops/rollback"
@@ -603,7 +814,9 @@ class BanmayunClient(object):
                   'to_version': to_version}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def thunder_upload(self, root_id, full_path, md5, bytes_, modified_at_millis):
         path = "/fileops/thunder_upload"
@@ -614,7 +827,51 @@ class BanmayunClient(object):
                   'modified_at_millis': modified_at_millis}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
+
+    def upload(self, root_id, full_path, source, modified_at_millis=None, overwrite=False,
+               chunked_threshold=CHUNKED_UPLOAD_THRESHOLD, uploader=None):
+        if isinstance(source, str):
+            with transfer.MappedFile(source) as f:
+                if modified_at_millis is None:
+                    modified_at_millis = int(os.fstat(f.fileno()).st_mtime * 1000)
+                return self.upload(root_id, full_path, f, modified_at_millis, overwrite, chunked_threshold,
+                                   uploader)
+
+        if modified_at_millis is None:
+            modified_at_millis = transfer.now_millis()
+
+        if not overwrite:
+            # thunder_upload and commit_chunked_upload always replace the target
+            self._check_absent(root_id, full_path)
+
+        start = source.tell()
+        md5, size = transfer.file_md5(source)
+        try:
+            return self.thunder_upload(root_id, full_path, md5, size, modified_at_millis)
+        except ErrorResponse as e:
+            if e.status != 404:
+                raise
+
+        source.seek(start)
+        if size < chunked_threshold:
+            return self.put_file_by_path(root_id, full_path, source, modified_at_millis, overwrite)
+
+        if uploader is None:
+            uploader = transfer.ChunkedUploader(self)
+        return uploader.upload(source, root_id, full_path, modified_at_millis)
+
+    def _check_absent(self, root_id, full_path):
+        try:
+            meta = self.get_meta(root_id, full_path)
+        except ErrorResponse as e:
+            if e.status != 404:
+                raise
+            return
+        if meta and not meta.get('is_deleted'):
+            raise transfer.TargetExistsError(full_path, meta)
 
     def utime_folder(self, root_id, full_path, modified_at_millis):
         path = "/fileops/utime_folder"
@@ -623,7 +880,9 @@ class BanmayunClient(object):
                   'modified_at_millis': modified_at_millis}
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def set_permission(self, root_id, full_path, permission):
         path = "/fileops/set_permission"
@@ -632,7 +891,9 @@ class BanmayunClient(object):
 
         url, params, headers = self.request(path, params=params)
         headers['content-type'] = 'application/json'
-        return self.rest_client.POST(url, headers=headers, body=json.dumps(permission))
+        result = self.rest_client.POST(url, headers=headers, body=codec.dumpb(permission))
+        self._cache_invalidate(root_id, full_path)
+        return result
 
     def list_permissions(self, root_id):
         path = "/fileops/list_permissions"
@@ -659,7 +920,10 @@ class BanmayunClient(object):
             params['cursor_id'] = cursor_id
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        delta = self.rest_client.POST(url, headers=headers)
+        if self.meta_cache is not None:
+            self.meta_cache.apply_delta(root_id, delta_entries(delta), reset=bool(delta.get('reset')))
+        return delta
 
     def get_trash(self, root_id, trash_id):
         path = "/roots/%s/trashes/%s" % (root_id, trash_id)
@@ -674,22 +938,29 @@ class BanmayunClient(object):
         if offset is not None:
             params['offset'] = offset
         if limit is not None:
-            params['limit'] = offset
+            params['limit'] = limit
 
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_trashes_for_root(self, root_id, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.list_trashes_for_root, root_id, page_size=page_size, prefetch=prefetch)
+
     def delete_trash(self, root_id, trash_id):
         path = "/roots/%s/trashes/%s" % (root_id, trash_id)
 
         url, params, headers = self.request(path)
-        return self.rest_client.DELETE(url, headers=headers)
+        result = self.rest_client.DELETE(url, headers=headers)
+        self._cache_invalidate_meta(root_id, None)
+        return result
 
     def delete_trashes_for_root(self, root_id):
         path = "/roots/%s/trashes" % root_id
 
         url, params, headers = self.request(path)
-        return self.rest_client.DELETE(url, headers=headers)
+        result = self.rest_client.DELETE(url, headers=headers)
+        self._cache_invalidate_meta(root_id, None)
+        return result
 
     def restore_trash(self, root_id, trash_id, to_full_path=None):
         path = "/roots/%s/trashes/%s/restore" % (root_id, trash_id)
@@ -699,7 +970,12 @@ class BanmayunClient(object):
             params['to_path'] = format_path(to_full_path)
 
         url, params, headers = self.request(path, params=params)
-        return self.rest_client.POST(url, headers=headers)
+        result = self.rest_client.POST(url, headers=headers)
+        if to_full_path is not None:
+            self._cache_invalidate(root_id, to_full_path)
+        else:
+            self._cache_invalidate_meta(root_id, result)
+        return result
 
     def search_users(self, query, group_id=None, offset=None, limit=None):
         path = "/search/users"
@@ -715,6 +991,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_search_users(self, query, group_id=None, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.search_users, query, group_id, page_size=page_size, prefetch=prefetch)
+
     def search_groups(self, query, user_id=None, offset=None, limit=None):
         path = "/search/groups"
 
@@ -729,13 +1008,16 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_search_groups(self, query, user_id=None, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.search_groups, query, user_id, page_size=page_size, prefetch=prefetch)
+
     def search_files(self, query, root_id=None, full_path=None, offset=None, limit=None):
         path = "/search/files"
 
         params = {'query': query}
         if root_id is not None:
             params['root_id'] = root_id
-        if path is not None:
+        if full_path is not None:
             params['path'] = format_path(full_path)
         if offset is not None:
             params['offset'] = offset
@@ -745,6 +1027,11 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_search_files(self, query, root_id=None, full_path=None,
+                          page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.search_files, query, root_id, full_path,
+                                page_size=page_size, prefetch=prefetch)
+
     def top_users(self, order_by, offset=None, limit=None):
         path = "/top/users"
 
@@ -757,6 +1044,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_top_users(self, order_by, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.top_users, order_by, page_size=page_size, prefetch=prefetch)
+
     def top_groups(self, order_by, offset=None, limit=None):
         path = "/top/groups"
 
@@ -769,6 +1059,9 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_top_groups(self, order_by, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.top_groups, order_by, page_size=page_size, prefetch=prefetch)
+
     def top_files(self, order_by, offset=None, limit=None):
         path = "/top/files"
 
@@ -781,13 +1074,16 @@ class BanmayunClient(object):
         url, params, headers = self.request(path, params=params)
         return self.rest_client.GET(url, headers=headers)
 
+    def iter_top_files(self, order_by, page_size=paging.PAGE_SIZE, prefetch=False):
+        return self._iter_pages(self.top_files, order_by, page_size=page_size, prefetch=prefetch)
+
     @staticmethod
     def __parse_meta_as_dict(raw_response):
         meta = None
-        for header, header_val in raw_response.getheaders().iteritems():
+        for header, header_val in raw_response.getheaders().items():
             if header.lower() == 'x-banmayun-meta':
                 try:
-                    meta = json.loads(header_val)
+                    meta = codec.loadb(header_val)
                 except ValueError:
                     raise ErrorResponse(raw_response, raw_response.read())
         if not meta:
@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class StdlibCodec(object):
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        self._decoder = json.JSONDecoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def dumpb(self, obj):
+        return self._encoder.encode(obj).encode('utf8')
+
+    def loadb(self, data):
+        if not isinstance(data, str):
+            data = bytes(data).decode('utf8')
+        return self._decoder.decode(data)
+
+
+class OrjsonCodec(object):
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("the orjson codec requires the orjson package")
+
+    def dumps(self, obj):
+        return orjson.dumps(obj).decode('utf8')
+
+    def dumpb(self, obj):
+        return orjson.dumps(obj)
+
+    def loadb(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(object):
+    name = 'ujson'
+
+    def __init__(self):
+        if ujson is None:
+            raise ImportError("the ujson codec requires the ujson package")
+
+    def dumps(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False)
+
+    def dumpb(self, obj):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf8')
+
+    def loadb(self, data):
+        return ujson.loads(data)
+
+
+CODECS = {'json': StdlibCodec, 'orjson': OrjsonCodec, 'ujson': UjsonCodec}
+
+
+def available_codecs():
+    names = ['json']
+    if orjson is not None:
+        names.insert(0, 'orjson')
+    if ujson is not None:
+        names.insert(len(names) - 1, 'ujson')
+    return names
+
+
+def create_codec(name=None):
+    if name is None:
+        name = available_codecs()[0]
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError("unknown JSON codec %r (expected one of %s)" % (name, ", ".join(sorted(CODECS))))
+
+
+_codec = create_codec()
+
+
+def get_codec():
+    return _codec
+
+
+def set_codec(codec):
+    global _codec
+    if codec is None or isinstance(codec, str):
+        codec = create_codec(codec)
+    _codec = codec
+    return codec
+
+
+def dumps(obj):
+    return _codec.dumps(obj)
+
+
+def dumpb(obj):
+    return _codec.dumpb(obj)
+
+
+def loadb(data):
+    return _codec.loadb(data)
@@ -0,0 +1,218 @@
+from __future__ import absolute_import
+
+import csv
+import math
+from array import array
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MISSING_INT = -(1 << 63)
+
+META_COLUMNS = (('path', 'path'), ('id', 'text'), ('root_id', 'str'), ('is_dir', 'bool'),
+                ('is_deleted', 'bool'), ('version', 'int'), ('bytes', 'int'), ('md5', 'text'),
+                ('created_at_millis', 'int'), ('created_by', 'str'), ('modified_at_millis', 'int'),
+                ('modified_by', 'str'))
+USER_COLUMNS = (('id', 'text'), ('name', 'text'), ('email', 'text'), ('display_name', 'text'),
+                ('role', 'str'), ('is_activated', 'bool'), ('is_blocked', 'bool'), ('root_id', 'text'),
+                ('created_at_millis', 'int'))
+GROUP_COLUMNS = (('id', 'text'), ('name', 'text'), ('type', 'str'), ('intro', 'text'), ('tags', 'text'),
+                 ('is_activated', 'bool'), ('is_blocked', 'bool'), ('is_visible', 'bool'),
+                 ('root_id', 'text'), ('owner_id', 'str'), ('created_at_millis', 'int'))
+LINK_COLUMNS = (('id', 'text'), ('user_id', 'str'), ('name', 'text'), ('device', 'str'), ('token', 'text'),
+                ('expires_at_millis', 'int'), ('created_at_millis', 'int'))
+SHARE_COLUMNS = (('id', 'text'), ('root_id', 'str'), ('meta_id', 'text'), ('password', 'text'),
+                 ('expires_at_millis', 'int'), ('created_at_millis', 'int'), ('created_by', 'str'))
+COMMENT_COLUMNS = (('id', 'text'), ('root_id', 'str'), ('meta_id', 'text'), ('contents', 'text'),
+                   ('created_at_millis', 'int'), ('created_by', 'str'))
+TRASH_COLUMNS = (('id', 'text'), ('root_id', 'str'), ('meta_id', 'text'), ('is_dir', 'bool'),
+                 ('path', 'path'), ('version', 'int'), ('bytes', 'int'), ('created_at_millis', 'int'),
+                 ('created_by', 'str'))
+
+KINDS = ('int', 'float', 'bool', 'str', 'text', 'path')
+NUMPY_DTYPES = {'int': 'int64', 'float': 'float64', 'bool': 'int8'}
+
+
+class StringTable(object):
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, code):
+        return self.values[code] if code >= 0 else None
+
+
+class _Column(object):
+    def __init__(self, name, kind, strings):
+        if kind not in KINDS:
+            raise ValueError("unknown column kind %r (expected one of %s)" % (kind, ", ".join(KINDS)))
+
+        self.name = name
+        self.kind = kind
+        self.strings = strings
+        self.names = None
+        if kind in ('int', 'float'):
+            self.data = array('q' if kind == 'int' else 'd')
+        elif kind == 'bool':
+            self.data = array('b')
+        elif kind == 'text':
+            self.data = []
+        else:
+            self.data = array('i')
+            if kind == 'path':
+                self.names = []
+
+    def append(self, value):
+        kind = self.kind
+        if kind == 'int':
+            self.data.append(MISSING_INT if value is None else int(value))
+        elif kind == 'float':
+            self.data.append(math.nan if value is None else float(value))
+        elif kind == 'bool':
+            self.data.append(-1 if value is None else int(bool(value)))
+        elif kind == 'text':
+            self.data.append(value)
+        elif kind == 'str':
+            self.data.append(-1 if value is None else self.strings.add(value))
+        elif value is None:
+            self.data.append(-1)
+            self.names.append(None)
+        else:
+            # paths share their parent folders through the string table
+            parent, sep, name = value.rpartition('/')
+            self.data.append(self.strings.add(parent + sep))
+            self.names.append(name)
+
+    def get(self, i):
+        kind = self.kind
+        value = self.data[i]
+        if kind == 'int':
+            return None if value == MISSING_INT else value
+        if kind == 'float':
+            return None if math.isnan(value) else value
+        if kind == 'bool':
+            return None if value < 0 else bool(value)
+        if kind == 'text':
+            return value
+        if kind == 'str':
+            return self.strings.get(value)
+        if value < 0:
+            return None
+        return self.strings.get(value) + self.names[i]
+
+    def values(self):
+        return [self.get(i) for i in range(len(self.data))]
+
+
+class ColumnarResult(object):
+    def __init__(self, columns=META_COLUMNS):
+        self.strings = StringTable()
+        self.columns = tuple((name, kind) for name, kind in columns)
+        self._columns = dict((name, _Column(name, kind, self.strings)) for name, kind in self.columns)
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def append(self, entry):
+        get = entry.get
+        for column in self._columns.values():
+            column.append(get(column.name))
+        self._length += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+        return self
+
+    def column(self, name):
+        return self._columns[name].values()
+
+    def array(self, name):
+        column = self._columns[name]
+        if column.kind in ('text', 'path'):
+            raise TypeError("column %r of kind %r has no flat array" % (name, column.kind))
+        return column.data
+
+    def row(self, i):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("row index out of range")
+        return dict((name, self._columns[name].get(i)) for name, _ in self.columns)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self.row(i)
+
+    def sum(self, name):
+        column = self._columns[name]
+        if column.kind == 'int':
+            return sum(value for value in column.data if value != MISSING_INT)
+        if column.kind == 'float':
+            return math.fsum(value for value in column.data if not math.isnan(value))
+        if column.kind == 'bool':
+            return sum(value for value in column.data if value > 0)
+        raise TypeError("column %r of kind %r cannot be summed" % (name, column.kind))
+
+    def counts(self, name):
+        column = self._columns[name]
+        if column.kind != 'str':
+            return Counter(column.values())
+        counts = Counter(column.data)
+        return Counter(dict((self.strings.get(code), n) for code, n in counts.items()))
+
+    def to_numpy(self):
+        if numpy is None:
+            raise ImportError("to_numpy requires numpy")
+
+        arrays = {}
+        for name, kind in self.columns:
+            column = self._columns[name]
+            if kind in NUMPY_DTYPES:
+                arrays[name] = numpy.frombuffer(column.data, dtype=NUMPY_DTYPES[kind])
+            else:
+                arrays[name] = numpy.array(column.values(), dtype=object)
+        return arrays
+
+    def to_csv(self, f, header=True):
+        if isinstance(f, str):
+            with open(f, 'w', newline='', encoding='utf-8') as out:
+                return self.to_csv(out, header)
+
+        writer = csv.writer(f)
+        names = [name for name, _ in self.columns]
+        if header:
+            writer.writerow(names)
+        columns = [self._columns[name] for name in names]
+        for i in range(self._length):
+            writer.writerow(['' if value is None else value for value in (c.get(i) for c in columns)])
+        return self._length
+
+
+def collect(entries, columns=META_COLUMNS):
+    return ColumnarResult(columns).extend(entries)
+
+
+def collect_delta(pairs, columns=META_COLUMNS, result=None):
+    if result is None:
+        result = ColumnarResult(columns)
+    for path, meta in pairs:
+        if meta is None:
+            result.append({'path': path, 'is_deleted': True})
+        else:
+            result.append(meta)
+    return result
@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+
+import sqlite3
+import threading
+
+from . import codec
+from .client import delta_cursor_id, delta_entries, format_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metas (
+    root_id TEXT NOT NULL,
+    path_lower TEXT NOT NULL,
+    parent_lower TEXT NOT NULL,
+    path TEXT NOT NULL,
+    meta_id TEXT,
+    is_dir INTEGER NOT NULL DEFAULT 0,
+    is_deleted INTEGER NOT NULL DEFAULT 0,
+    version INTEGER,
+    bytes INTEGER,
+    modified_at_millis INTEGER,
+    md5 TEXT,
+    meta TEXT,
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (root_id, path_lower)
+);
+CREATE INDEX IF NOT EXISTS metas_parent ON metas (root_id, parent_lower);
+CREATE INDEX IF NOT EXISTS metas_seq ON metas (root_id, seq);
+CREATE INDEX IF NOT EXISTS metas_meta_id ON metas (root_id, meta_id);
+CREATE TABLE IF NOT EXISTS roots (
+    root_id TEXT PRIMARY KEY,
+    cursor_id TEXT,
+    seq INTEGER NOT NULL DEFAULT 0
+);
+"""
+DELETE_SUBTREE = ("UPDATE metas SET is_deleted = 1, seq = ? "
+                  "WHERE root_id = ? AND path_lower >= ? AND path_lower < ? AND is_deleted = 0")
+SELECT_SUBTREE = ("SELECT meta FROM metas WHERE root_id = ? "
+                  "AND path_lower >= ? AND path_lower < ? AND is_deleted = 0 ORDER BY path_lower")
+
+
+def _parent(path_lower):
+    return path_lower.rsplit('/', 1)[0]
+
+
+def _subtree_bounds(path_lower):
+    # '0' sorts right after '/', so this half-open range covers exactly the descendants
+    prefix = path_lower + '/'
+    return prefix, prefix[:-1] + '0'
+
+
+class TreeIndex(object):
+    def __init__(self, db_path, root_id):
+        self.root_id = str(root_id)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("INSERT OR IGNORE INTO roots (root_id, seq) VALUES (?, 0)", (self.root_id,))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
+
+    @property
+    def cursor_id(self):
+        return self._root_state()['cursor_id']
+
+    @property
+    def seq(self):
+        return self._root_state()['seq']
+
+    def _root_state(self):
+        with self._lock:
+            return self._conn.execute("SELECT cursor_id, seq FROM roots WHERE root_id = ?",
+                                      (self.root_id,)).fetchone()
+
+    def update(self, client):
+        applied = 0
+        while True:
+            delta = client.delta(self.root_id, self.cursor_id)
+            applied += self.apply_delta(delta)
+            if not delta.get('has_more'):
+                return applied
+
+    def apply_delta(self, delta):
+        entries = list(delta_entries(delta))
+        cursor_id = delta_cursor_id(delta)
+        with self._lock, self._conn:
+            seq = self._conn.execute("SELECT seq FROM roots WHERE root_id = ?",
+                                     (self.root_id,)).fetchone()['seq'] + 1
+            if delta.get('reset'):
+                self._conn.execute("UPDATE metas SET is_deleted = 1, seq = ? "
+                                   "WHERE root_id = ? AND is_deleted = 0", (seq, self.root_id))
+            for path, meta in entries:
+                self._apply_entry(format_path(path) or '', meta, seq)
+            self._conn.execute("UPDATE roots SET cursor_id = ?, seq = ? WHERE root_id = ?",
+                               (cursor_id, seq, self.root_id))
+        return len(entries)
+
+    def _apply_entry(self, path, meta, seq):
+        path_lower = path.lower()
+        if meta is None or not meta.get('is_dir'):
+            low, high = _subtree_bounds(path_lower)
+            self._conn.execute(DELETE_SUBTREE, (seq, self.root_id, low, high))
+        if meta is None:
+            self._conn.execute("UPDATE metas SET is_deleted = 1, seq = ? "
+                               "WHERE root_id = ? AND path_lower = ? AND is_deleted = 0",
+                               (seq, self.root_id, path_lower))
+            return
+
+        self._conn.execute("INSERT OR REPLACE INTO metas (root_id, path_lower, parent_lower, path, meta_id, "
+                           "is_dir, is_deleted, version, bytes, modified_at_millis, md5, meta, seq) "
+                           "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?)",
+                           (self.root_id, path_lower, _parent(path_lower), meta.get('path', path),
+                            meta.get('id'), int(bool(meta.get('is_dir'))), meta.get('version'),
+                            meta.get('bytes'), meta.get('modified_at_millis'), meta.get('md5'),
+                            codec.dumps(meta), seq))
+
+    def get_meta(self, full_path):
+        with self._lock:
+            row = self._conn.execute("SELECT meta FROM metas WHERE root_id = ? AND path_lower = ? "
+                                     "AND is_deleted = 0",
+                                     (self.root_id, (format_path(full_path) or '').lower())).fetchone()
+        return codec.loadb(row['meta']) if row is not None else None
+
+    def get_meta_by_id(self, meta_id):
+        with self._lock:
+            row = self._conn.execute("SELECT meta FROM metas WHERE root_id = ? AND meta_id = ? "
+                                     "AND is_deleted = 0", (self.root_id, meta_id)).fetchone()
+        return codec.loadb(row['meta']) if row is not None else None
+
+    def list_folder(self, full_path):
+        with self._lock:
+            rows = self._conn.execute("SELECT meta FROM metas WHERE root_id = ? AND parent_lower = ? "
+                                      "AND is_deleted = 0 ORDER BY path_lower",
+                                      (self.root_id, (format_path(full_path) or '').lower())).fetchall()
+        return [codec.loadb(row['meta']) for row in rows]
+
+    def iter_subtree(self, full_path):
+        low, high = _subtree_bounds((format_path(full_path) or '').lower())
+        with self._lock:
+            rows = self._conn.execute(SELECT_SUBTREE, (self.root_id, low, high)).fetchall()
+        for row in rows:
+            yield codec.loadb(row['meta'])
+
+    def changed_since(self, seq):
+        with self._lock:
+            rows = self._conn.execute("SELECT path, is_deleted, meta FROM metas "
+                                      "WHERE root_id = ? AND seq > ? ORDER BY seq, path_lower",
+                                      (self.root_id, seq)).fetchall()
+        return [(row['path'], None if row['is_deleted'] else codec.loadb(row['meta'])) for row in rows]
+
+    def compact(self, seq=None):
+        if seq is None:
+            seq = self.seq
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM metas WHERE root_id = ? AND is_deleted = 1 AND seq <= ?",
+                               (self.root_id, seq))
@@ -0,0 +1,269 @@
+from __future__ import absolute_import
+
+import codecs
+import json
+from collections import deque
+
+BLOCK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+DELIMITERS = WHITESPACE + ',:]}'
+
+_MISSING = object()
+
+
+class EntryParser(object):
+    START, KEY, COLON, VALUE, ELEMENTS, END = range(6)
+
+    def __init__(self, key='entries'):
+        self.key = key
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._state = EntryParser.START
+        self._field = None
+        self._top_level_array = False
+
+    def feed(self, data):
+        self._buf = self._buf[self._pos:] + self._utf8.decode(data)
+        self._pos = 0
+        return self._parse(False)
+
+    def close(self):
+        self._buf = self._buf[self._pos:] + self._utf8.decode(b'', True)
+        self._pos = 0
+        entries = self._parse(True)
+        if self._state != EntryParser.END or self._buf[self._pos:].strip(WHITESPACE):
+            raise ValueError("truncated or malformed JSON response")
+        return entries
+
+    def _skip(self):
+        buf = self._buf
+        pos = self._pos
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return buf[pos] if pos < len(buf) else None
+
+    def _value(self, final):
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            if final:
+                raise
+            return False, None
+        if not final and (end == len(self._buf) or self._buf[end] not in DELIMITERS):
+            # a number such as "-0." may continue in the next block
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _parse(self, final):
+        entries = []
+        while True:
+            c = self._skip()
+            if c is None:
+                return entries
+
+            state = self._state
+            if state == EntryParser.START:
+                if c == '[':
+                    self._top_level_array = True
+                    self._state = EntryParser.ELEMENTS
+                elif c == '{':
+                    self._state = EntryParser.KEY
+                else:
+                    raise ValueError("expected a JSON object or array")
+                self._pos += 1
+            elif state == EntryParser.KEY:
+                if c in ',}':
+                    self._pos += 1
+                    if c == '}':
+                        self._state = EntryParser.END
+                    continue
+                if c != '"':
+                    raise ValueError("expected a string object key")
+                ok, self._field = self._value(final)
+                if not ok:
+                    return entries
+                self._state = EntryParser.COLON
+            elif state == EntryParser.COLON:
+                if c != ':':
+                    raise ValueError("expected ':' after object key")
+                self._pos += 1
+                self._state = EntryParser.VALUE
+            elif state == EntryParser.VALUE:
+                if c == '[' and self._field == self.key:
+                    self._pos += 1
+                    self._state = EntryParser.ELEMENTS
+                    continue
+                ok, value = self._value(final)
+                if not ok:
+                    return entries
+                self.fields[self._field] = value
+                self._state = EntryParser.KEY
+            elif state == EntryParser.ELEMENTS:
+                if c in ',]':
+                    self._pos += 1
+                    if c == ']':
+                        self._state = EntryParser.END if self._top_level_array else EntryParser.KEY
+                    continue
+                ok, value = self._value(final)
+                if not ok:
+                    return entries
+                entries.append(value)
+            else:
+                return entries
+
+
+class EntryStream(object):
+    def __init__(self, response, key='entries', block_size=BLOCK_SIZE):
+        self.response = response
+        self.key = key
+        self.block_size = block_size
+        self._parser = EntryParser(key)
+        self._pending = deque()
+        self._done = False
+
+    @property
+    def fields(self):
+        return self._parser.fields
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._pending:
+            if self._done:
+                raise StopIteration
+            self._fill()
+        return self._pending.popleft()
+
+    def _fill(self):
+        try:
+            data = self.response.read(self.block_size)
+            if data:
+                self._pending.extend(self._parser.feed(data))
+            else:
+                self._pending.extend(self._parser.close())
+                self._done = True
+                self.response.close()
+        except BaseException:
+            self._done = True
+            self.response.close()
+            raise
+
+    def _drain(self):
+        while not self._done:
+            self._fill()
+
+    def get(self, name, default=None):
+        if name == self.key:
+            return self
+        if name not in self.fields:
+            # fields that follow the entries array force the remaining entries into memory
+            self._drain()
+        return self.fields.get(name, default)
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def close(self):
+        self._done = True
+        self._pending.clear()
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
+
+
+class AsyncEntryStream(EntryStream):
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self._done:
+                raise StopAsyncIteration
+            await self._afill()
+        return self._pending.popleft()
+
+    async def _afill(self):
+        try:
+            data = await self.response.read(self.block_size)
+            if data:
+                self._pending.extend(self._parser.feed(data))
+            else:
+                self._pending.extend(self._parser.close())
+                self._done = True
+                self.response.close()
+        except BaseException:
+            self._done = True
+            self.response.close()
+            raise
+
+    async def aget(self, name, default=None):
+        if name == self.key:
+            return self
+        while name not in self.fields and not self._done:
+            await self._afill()
+        return self.fields.get(name, default)
+
+    def get(self, name, default=None):
+        if name == self.key:
+            return self
+        return self.fields.get(name, default)
+
+    def __iter__(self):
+        raise TypeError("use 'async for' with AsyncEntryStream")
+
+    async def aclose(self):
+        self._done = True
+        self._pending.clear()
+        await self.response.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, typ, value, traceback):
+        await self.aclose()
+
+
+class StreamingRESTClient(object):
+    def __init__(self, rest_client, key='entries', block_size=BLOCK_SIZE):
+        self.rest_client = rest_client
+        self.key = key
+        self.block_size = block_size
+
+    def request(self, method, url, headers=None, body=None, raw_response=False):
+        r = self.rest_client.request(method, url, headers=headers, body=body, raw_response=True)
+        if raw_response:
+            return r
+        return EntryStream(r, self.key, self.block_size)
+
+    def GET(self, url, headers=None, raw_response=False):
+        return self.request("GET", url, headers=headers, raw_response=raw_response)
+
+    def POST(self, url, headers=None, body=None, raw_response=False):
+        return self.request("POST", url, headers=headers, body=body, raw_response=raw_response)
+
+    def PUT(self, url, headers=None, body=None, raw_response=False):
+        return self.request("PUT", url, headers=headers, body=body, raw_response=raw_response)
+
+    def DELETE(self, url, headers=None, raw_response=False):
+        return self.request("DELETE", url, headers=headers, raw_response=raw_response)
+
+
+class AsyncStreamingRESTClient(StreamingRESTClient):
+    async def request(self, method, url, headers=None, body=None, raw_response=False):
+        r = await self.rest_client.request(method, url, headers=headers, body=body, raw_response=True)
+        if raw_response:
+            return r
+        return AsyncEntryStream(r, self.key, self.block_size)
@@ -0,0 +1,184 @@
+from __future__ import absolute_import
+
+import sys
+import threading
+from types import MappingProxyType
+
+from .client import delta_entries
+from .paging import page_entries
+
+_MISSING = object()
+_SHARED_MAPPINGS = {}
+_SHARED_MAPPINGS_LOCK = threading.Lock()
+MAX_SHARED_MAPPINGS = 4096
+
+
+def interned(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def shared_mapping(value):
+    try:
+        key = tuple(sorted(value.items()))
+        shared = _SHARED_MAPPINGS.get(key)
+    except TypeError:
+        return MappingProxyType(dict(value))
+    if shared is None:
+        # small flag mappings such as permissions repeat across almost every entry
+        shared = MappingProxyType(dict(value))
+        with _SHARED_MAPPINGS_LOCK:
+            if len(_SHARED_MAPPINGS) < MAX_SHARED_MAPPINGS:
+                shared = _SHARED_MAPPINGS.setdefault(key, shared)
+    return shared
+
+
+def _slots(fields):
+    return tuple(name for name, _ in fields)
+
+
+class Model(object):
+    __slots__ = ('extra',)
+    FIELDS = ()
+    _NAMES = frozenset()
+
+    def __init__(self, **kwargs):
+        for name, convert in self.FIELDS:
+            value = kwargs.pop(name, None)
+            setattr(self, name, None if value is None else convert(value))
+        self.extra = kwargs or None
+
+    @classmethod
+    def from_dict(cls, data):
+        if data is None or isinstance(data, cls):
+            return data
+
+        self = cls.__new__(cls)
+        for name, convert in cls.FIELDS:
+            value = data.get(name)
+            setattr(self, name, None if value is None else convert(value))
+        if cls._NAMES.issuperset(data):
+            self.extra = None
+        else:
+            self.extra = dict((key, value) for key, value in data.items() if key not in cls._NAMES)
+        return self
+
+    def to_dict(self):
+        data = {}
+        for name, _ in self.FIELDS:
+            value = getattr(self, name)
+            if isinstance(value, MappingProxyType):
+                value = dict(value)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, name, default=None):
+        if name in self._NAMES:
+            value = getattr(self, name)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(name, default)
+        return default
+
+    def __getitem__(self, name):
+        value = self.get(name, _MISSING)
+        if value is _MISSING:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, _MISSING) is not _MISSING
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        other = self.from_dict(state)
+        for name in self._NAMES:
+            setattr(self, name, getattr(other, name))
+        self.extra = other.extra
+
+    def __repr__(self):
+        key = getattr(self, 'path', None) or getattr(self, 'name', None)
+        return "%s(id=%r, %r)" % (type(self).__name__, getattr(self, 'id', None), key)
+
+
+class Meta(Model):
+    FIELDS = (('id', interned), ('root_id', interned), ('path', interned), ('name', str),
+              ('is_dir', bool), ('is_deleted', bool), ('version', int), ('bytes', int), ('size', interned),
+              ('md5', str), ('created_at_millis', int), ('created_by', interned),
+              ('modified_at_millis', int), ('modified_by', interned), ('client_modified_at_millis', int),
+              ('permission', shared_mapping))
+    __slots__ = _slots(FIELDS)
+
+
+class User(Model):
+    FIELDS = (('id', interned), ('name', interned), ('email', str), ('display_name', str), ('role', interned),
+              ('is_activated', bool), ('is_blocked', bool), ('root_id', interned), ('created_at_millis', int))
+    __slots__ = _slots(FIELDS)
+
+
+class Group(Model):
+    FIELDS = (('id', interned), ('name', interned), ('type', interned), ('intro', str), ('tags', str),
+              ('is_activated', bool), ('is_blocked', bool), ('is_visible', bool), ('root_id', interned),
+              ('owner_id', interned), ('created_at_millis', int))
+    __slots__ = _slots(FIELDS)
+
+
+class Link(Model):
+    FIELDS = (('id', interned), ('user_id', interned), ('name', str), ('device', interned), ('token', str),
+              ('expires_at_millis', int), ('created_at_millis', int))
+    __slots__ = _slots(FIELDS)
+
+
+class Share(Model):
+    FIELDS = (('id', interned), ('root_id', interned), ('meta_id', interned), ('password', str),
+              ('expires_at_millis', int), ('created_at_millis', int), ('created_by', interned))
+    __slots__ = _slots(FIELDS)
+
+
+class Comment(Model):
+    FIELDS = (('id', interned), ('root_id', interned), ('meta_id', interned), ('contents', str),
+              ('created_at_millis', int), ('created_by', interned))
+    __slots__ = _slots(FIELDS)
+
+
+class Trash(Model):
+    FIELDS = (('id', interned), ('root_id', interned), ('meta_id', interned), ('is_dir', bool),
+              ('path', interned), ('version', int), ('bytes', int), ('created_at_millis', int),
+              ('created_by', interned))
+    __slots__ = _slots(FIELDS)
+
+
+for _cls in (Meta, User, Group, Link, Share, Comment, Trash):
+    _cls._NAMES = frozenset(_cls.__slots__)
+del _cls
+
+
+def iter_models(model, page):
+    for entry in page_entries(page):
+        yield model.from_dict(entry)
+
+
+def load_models(model, page):
+    return [model.from_dict(entry) for entry in page_entries(page)]
+
+
+def iter_delta(delta):
+    for path, meta in delta_entries(delta):
+        yield interned(path), Meta.from_dict(meta)
@@ -0,0 +1,184 @@
+from __future__ import absolute_import
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PAGE_SIZE = 100
+
+
+def page_entries(page):
+    if isinstance(page, list):
+        return page
+    return page.get('entries') or []
+
+
+def page_total(page):
+    if isinstance(page, dict):
+        return page.get('total')
+    return None
+
+
+def has_more(page, offset, page_size):
+    entries = page_entries(page)
+    total = page_total(page)
+    if not entries:
+        return False
+    if total is not None:
+        return offset + len(entries) < total
+    return len(entries) >= page_size
+
+
+def iter_pages(list_method, *args, page_size=PAGE_SIZE, prefetch=False, **kwargs):
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    def fetch(offset):
+        return list_method(*args, offset=offset, limit=page_size, **kwargs)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    pending = None
+    try:
+        offset = 0
+        page = fetch(offset)
+        while True:
+            entries = page_entries(page)
+            next_offset = offset + len(entries)
+            more = has_more(page, offset, page_size)
+
+            if more and executor is not None:
+                pending = executor.submit(fetch, next_offset)
+
+            for entry in entries:
+                yield entry
+
+            if not more:
+                return
+
+            offset = next_offset
+            if pending is not None:
+                page, pending = pending.result(), None
+            else:
+                page = fetch(offset)
+    finally:
+        if executor is not None:
+            if pending is not None:
+                pending.cancel()
+            executor.shutdown(wait=False)
+
+
+def iter_pages_concurrently(list_method, *args, page_size=PAGE_SIZE, max_workers=4, **kwargs):
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+    if max_workers <= 0:
+        raise ValueError("max_workers must be positive")
+
+    def fetch(offset):
+        return list_method(*args, offset=offset, limit=page_size, **kwargs)
+
+    page = fetch(0)
+    entries = page_entries(page)
+    for entry in entries:
+        yield entry
+    if not has_more(page, 0, page_size):
+        return
+
+    total = page_total(page)
+    stride = len(entries)
+    next_offset = stride
+    window = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while True:
+                while len(window) < 2 * max_workers and (total is None or next_offset < total):
+                    window.append((next_offset, executor.submit(fetch, next_offset)))
+                    next_offset += stride
+                if not window:
+                    return
+
+                offset, future = window.popleft()
+                page = future.result()
+                for entry in page_entries(page):
+                    yield entry
+                if total is None and not has_more(page, offset, page_size):
+                    return
+        finally:
+            for offset, future in window:
+                future.cancel()
+
+
+async def aiter_pages(list_method, *args, page_size=PAGE_SIZE, prefetch=False, **kwargs):
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+
+    def fetch(offset):
+        return asyncio.ensure_future(list_method(*args, offset=offset, limit=page_size, **kwargs))
+
+    pending = None
+    try:
+        offset = 0
+        page = await fetch(offset)
+        while True:
+            entries = page_entries(page)
+            next_offset = offset + len(entries)
+            more = has_more(page, offset, page_size)
+
+            if more and prefetch:
+                pending = fetch(next_offset)
+
+            for entry in entries:
+                yield entry
+
+            if not more:
+                return
+
+            offset = next_offset
+            if pending is not None:
+                page, pending = await pending, None
+            else:
+                page = await fetch(offset)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def aiter_pages_concurrently(list_method, *args, page_size=PAGE_SIZE, max_workers=4, **kwargs):
+    if page_size <= 0:
+        raise ValueError("page_size must be positive")
+    if max_workers <= 0:
+        raise ValueError("max_workers must be positive")
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch(offset):
+        async with semaphore:
+            return await list_method(*args, offset=offset, limit=page_size, **kwargs)
+
+    page = await fetch(0)
+    entries = page_entries(page)
+    for entry in entries:
+        yield entry
+    if not has_more(page, 0, page_size):
+        return
+
+    total = page_total(page)
+    stride = len(entries)
+    next_offset = stride
+    window = deque()
+    try:
+        while True:
+            while len(window) < 2 * max_workers and (total is None or next_offset < total):
+                window.append((next_offset, asyncio.ensure_future(fetch(next_offset))))
+                next_offset += stride
+            if not window:
+                return
+
+            offset, future = window.popleft()
+            page = await future
+            for entry in page_entries(page):
+                yield entry
+            if total is None and not has_more(page, offset, page_size):
+                return
+    finally:
+        for offset, future in window:
+            future.cancel()
@@ -1,21 +1,39 @@
-import json
+import email.utils
+import gzip
 import io
+import os
+import random
+import re
 import socket
-import sys
+import threading
+import time
 import urllib3
+import zlib
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from . import codec
+from .transport import create_ssl_context
 
 SDK_VERSION = "1.0.0-prealpha"
 
+CONTENT_URL_PATTERN = re.compile(r'/roots/[^/]+/files/(p/[^?]*|[^/?]+)(\?|$)|'
+                                 r'/(thumbnail|avatar|logo)(\?|$)|/chunked_upload(\?|$)')
+ACCEPT_ENCODING = 'gzip, deflate, zstd' if zstandard is not None else 'gzip, deflate'
+
 
 class RESTResponse(io.IOBase):
-    def __init__(self, resp, *args, **kwargs):
+    def __init__(self, resp, *args, on_close=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.urllib3_response = resp
+        self.on_close = on_close
         self.status = resp.status
         self.version = resp.version
         self.reason = resp.reason
-        self.strict = resp.strict
+        self.strict = getattr(resp, 'strict', None)
         self.is_closed = False
 
     def __del__(self):
@@ -29,17 +47,29 @@ class RESTResponse(io.IOBase):
             raise ValueError('Response already closed')
         return self.urllib3_response.read(amt)
 
+    def readinto(self, b):
+        if self.is_closed:
+            raise ValueError('Response already closed')
+        return self.urllib3_response.readinto(b)
+
+    def readable(self):
+        return True
+
     BLOCK_SIZE = 4 * 1024 * 1024
 
     def close(self):
         if self.is_closed:
             return
 
-        while self.read(RESTResponse.BLOCK_SIZE):
-            pass
-
-        self.is_closed = True
-        self.urllib3_response.release_conn()
+        try:
+            while self.read(RESTResponse.BLOCK_SIZE):
+                pass
+        finally:
+            self.is_closed = True
+            self.urllib3_response.release_conn()
+            if self.on_close is not None:
+                on_close, self.on_close = self.on_close, None
+                on_close(self)
 
     @property
     def closed(self):
@@ -80,54 +110,415 @@ def create_connection(address):
         raise socket.error("getaddrinfo returns an empty list")
 
 
+def prepare_body(body):
+    if body is None or isinstance(body, (str, bytes)):
+        return body, None
+
+    if hasattr(body, 'getbuffer'):
+        view = body.getbuffer()[body.tell():]
+        return view, view.nbytes
+
+    if hasattr(body, 'getvalue'):
+        return body.getvalue(), None
+
+    try:
+        view = memoryview(body)
+    except TypeError:
+        pass
+    else:
+        return view, view.nbytes
+
+    if hasattr(body, 'read'):
+        try:
+            return body, os.fstat(body.fileno()).st_size - body.tell()
+        except (AttributeError, OSError, ValueError):
+            return body, None
+
+    return body, None
+
+
+def encode_request(url, headers, body, accept_encoding=True, compress_min_size=None):
+    if CONTENT_URL_PATTERN.search(url):
+        # file content is usually compressed already and must stay byte-addressable for ranges
+        headers.setdefault('Accept-Encoding', 'identity')
+        return body
+
+    if accept_encoding:
+        headers.setdefault('Accept-Encoding', ACCEPT_ENCODING)
+    if compress_min_size is not None and isinstance(body, (str, bytes)) and len(body) >= compress_min_size \
+            and 'Content-Encoding' not in headers:
+        if isinstance(body, str):
+            body = body.encode('utf8')
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+        headers['Content-Encoding'] = 'gzip'
+    return body
+
+
+class StreamDecoder(object):
+    def __init__(self, encoding):
+        encoding = encoding.strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._obj = zlib.decompressobj()
+        elif encoding == 'zstd' and zstandard is not None:
+            self._obj = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            raise ValueError("unsupported content encoding %r" % encoding)
+        self.encoding = encoding
+        self._started = False
+
+    def decompress(self, data):
+        if not data:
+            return b''
+        if self.encoding == 'deflate' and not self._started:
+            self._started = True
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                # some servers send raw deflate streams without the zlib header
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(data)
+
+    def flush(self):
+        flush = getattr(self._obj, 'flush', None)
+        return flush() if flush is not None else b''
+
+
 def json_loadb(data):
-    if sys.version_info >= (3,):
-        data = data.decode('utf8')
-    return json.loads(data)
+    return codec.loadb(data)
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def rewind_body(body):
+    if body is None or isinstance(body, (str, bytes, memoryview)):
+        return lambda: body
+    if hasattr(body, 'seek') and hasattr(body, 'tell'):
+        try:
+            position = body.tell()
+        except (OSError, ValueError):
+            return None
+
+        def rewind():
+            body.seek(position)
+            return body
+        return rewind
+    return None
+
+
+class RetryBudget(object):
+    def __init__(self, ratio=0.2, min_per_second=1.0, max_tokens=100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class RetryPolicy(object):
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+    SAFE_URL_PATTERNS = (r'/fileops/(get_meta|list_folder|list_permissions)\?',
+                         r'/(users|groups)/exists\b',
+                         r'/delta\?',
+                         r'/chunked_upload\?(.*&)?upload_id=')
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0, jitter=True,
+                 methods=IDEMPOTENT_METHODS, statuses=RETRY_STATUSES, safe_urls=SAFE_URL_PATTERNS,
+                 budget=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.safe_urls = [re.compile(pattern) for pattern in safe_urls]
+        self.budget = budget if budget is not None else RetryBudget()
+        self.stats = {'requests': 0, 'retries': 0, 'exhausted': 0, 'budget_exhausted': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def is_safe(self, method, url):
+        return method in self.methods or any(pattern.search(url) for pattern in self.safe_urls)
+
+    def started(self):
+        self._count('requests')
+        self.budget.deposit()
+
+    def should_retry(self, method, url, attempt, status=None, sent=True):
+        if status is not None:
+            retryable = status in self.statuses and self.is_safe(method, url)
+        else:
+            retryable = not sent or self.is_safe(method, url)
+        if not retryable:
+            return False
+
+        if attempt >= self.max_retries:
+            self._count('exhausted')
+            return False
+        if not self.budget.withdraw():
+            self._count('budget_exhausted')
+            return False
+        self._count('retries')
+        return True
+
+    def delay(self, attempt, retry_after=None):
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst=None, min_rate=None, decrease=0.5, increase=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.min_rate = float(min_rate if min_rate is not None else rate / 20.0)
+        self.decrease = decrease
+        self.increase = increase if increase is not None else rate / 100.0
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiter(object):
+    METADATA = 'metadata'
+    TRANSFER = 'transfer'
+    TRANSFER_URL_PATTERN = CONTENT_URL_PATTERN
+    THROTTLE_STATUSES = frozenset([429, 503])
+
+    def __init__(self, metadata_rate=50.0, metadata_burst=None, metadata_in_flight=32,
+                 transfer_rate=10.0, transfer_burst=None, transfer_in_flight=8):
+        self.buckets = {RateLimiter.METADATA: TokenBucket(metadata_rate, metadata_burst),
+                        RateLimiter.TRANSFER: TokenBucket(transfer_rate, transfer_burst)}
+        self.max_in_flight = {RateLimiter.METADATA: metadata_in_flight,
+                              RateLimiter.TRANSFER: transfer_in_flight}
+        self._semaphores = dict((name, threading.BoundedSemaphore(limit))
+                                for name, limit in self.max_in_flight.items() if limit)
+        self.stats = {'throttled': 0, 'waited': 0.0}
+
+    def classify(self, method, url):
+        if self.TRANSFER_URL_PATTERN.search(url):
+            return RateLimiter.TRANSFER
+        return RateLimiter.METADATA
+
+    def reserve(self, endpoint_class):
+        delay = self.buckets[endpoint_class].reserve()
+        self.stats['waited'] += delay
+        return delay
+
+    def acquire(self, endpoint_class):
+        delay = self.reserve(endpoint_class)
+        if delay:
+            time.sleep(delay)
+        semaphore = self._semaphores.get(endpoint_class)
+        if semaphore is not None:
+            semaphore.acquire()
+
+    def release(self, endpoint_class):
+        semaphore = self._semaphores.get(endpoint_class)
+        if semaphore is not None:
+            semaphore.release()
+
+    def observe(self, endpoint_class, status):
+        if status in self.THROTTLE_STATUSES:
+            self.stats['throttled'] += 1
+            self.buckets[endpoint_class].throttled()
+        elif status == 200:
+            self.buckets[endpoint_class].succeeded()
+
+
+def socket_options(tcp_nodelay=True, tcp_keepalive=None, extra=None):
+    options = []
+    if tcp_nodelay:
+        options.append((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1))
+    if tcp_keepalive:
+        options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        idle = int(tcp_keepalive)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle))
+        elif hasattr(socket, 'TCP_KEEPALIVE'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle))
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 4)))
+    if extra:
+        options.extend(extra)
+    return options
 
 
 class RESTClientObject(object):
-    def __init__(self, max_reusable_connections=8, mock_urlopen=None):
+    def __init__(self, max_reusable_connections=8, mock_urlopen=None, retry_policy=None, rate_limiter=None,
+                 num_pools=4, block=False, pool_timeout=None, connect_timeout=10.0, read_timeout=10.0,
+                 keep_alive=True, tcp_nodelay=True, tcp_keepalive=None, extra_socket_options=None,
+                 ssl_context=None, transport=None, accept_encoding=True, compress_requests=False,
+                 compress_min_size=1024):
+        if max_reusable_connections <= 0:
+            raise ValueError("max_reusable_connections must be positive")
+
         self.mock_urlopen = mock_urlopen
-        self.pool_manager = urllib3.PoolManager(
-            num_pools=4,
-            maxsize=max_reusable_connections,
-            block=False,
-            timeout=10.0
-        )
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rate_limiter = rate_limiter
+        self.block = block
+        self.pool_timeout = pool_timeout
+        self.keep_alive = keep_alive
+        self.accept_encoding = accept_encoding
+        self.compress_min_size = compress_min_size if compress_requests else None
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        if transport is None:
+            transport = urllib3.PoolManager(
+                num_pools=num_pools,
+                maxsize=max_reusable_connections,
+                block=block,
+                timeout=self.timeout,
+                socket_options=socket_options(tcp_nodelay, tcp_keepalive, extra_socket_options),
+                ssl_context=ssl_context if ssl_context is not None else create_ssl_context()
+            )
+        self.pool_manager = transport
+
+    def close(self):
+        self.pool_manager.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
 
     def request(self, method, url, headers=None, body=None, raw_response=False):
         headers = headers or {}
         headers['User-Agent'] = 'OfficialBanmayunPythonSDK/' + SDK_VERSION
+        if not self.keep_alive:
+            headers['Connection'] = 'close'
 
-        if hasattr(body, 'getvalue'):
-            body = str(body.getvalue())
-            headers["Content-Length"] = len(body)
+        body = encode_request(url, headers, body, self.accept_encoding, self.compress_min_size)
+        body, content_length = prepare_body(body)
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
 
         for key, value in headers.items():
             if isinstance(value, str) and '\n' in value:
                 raise ValueError("headers should not contain newlines (%s: %s)" %
                                  (key, value))
 
-        try:
-            urlopen = self.mock_urlopen if self.mock_urlopen else self.pool_manager.urlopen
-            r = urlopen(
-                method=method,
-                url=url,
-                body=body,
-                headers=headers,
-                preload_content=False
-            )
-            r = RESTResponse(r)
-        except socket.error as e:
-            raise RESTSocketError(url, e)
-        except urllib3.exceptions.SSLError as e:
-            raise RESTSocketError(url, "SSL certificate error: %s" % e)
-
-        if r.status != 200:
-            raise ErrorResponse(r, r.read())
-
-        return self.process_response(r, raw_response)
+        policy = self.retry_policy
+        limiter = self.rate_limiter
+        endpoint_class = limiter.classify(method, url) if limiter is not None else None
+        rewind = rewind_body(body)
+        policy.started()
+        attempt = 0
+        while True:
+            on_close = None
+            if limiter is not None:
+                limiter.acquire(endpoint_class)
+                on_close = lambda response: limiter.release(endpoint_class)
+            try:
+                if self.mock_urlopen:
+                    r = self.mock_urlopen(
+                        method=method,
+                        url=url,
+                        body=body,
+                        headers=headers,
+                        preload_content=False,
+                        retries=False
+                    )
+                else:
+                    r = self.pool_manager.urlopen(
+                        method=method,
+                        url=url,
+                        body=body,
+                        headers=headers,
+                        preload_content=False,
+                        retries=False,
+                        pool_timeout=self.pool_timeout
+                    )
+                r = RESTResponse(r, on_close=on_close)
+            except urllib3.exceptions.SSLError as e:
+                if on_close is not None:
+                    on_close(None)
+                raise RESTSocketError(url, "SSL certificate error: %s" % e)
+            except (socket.error, urllib3.exceptions.HTTPError) as e:
+                if on_close is not None:
+                    on_close(None)
+                sent = not isinstance(e, urllib3.exceptions.ConnectTimeoutError)
+                if rewind is None or not policy.should_retry(method, url, attempt, sent=sent):
+                    raise RESTSocketError(url, e)
+                time.sleep(policy.delay(attempt))
+                body = rewind()
+                attempt += 1
+                continue
+
+            if limiter is not None:
+                limiter.observe(endpoint_class, r.status)
+
+            if r.status != 200:
+                if rewind is not None and policy.should_retry(method, url, attempt, status=r.status):
+                    retry_after = parse_retry_after(r.getheader('Retry-After'))
+                    r.close()
+                    time.sleep(policy.delay(attempt, retry_after))
+                    body = rewind()
+                    attempt += 1
+                    continue
+                raise ErrorResponse(r, r.read())
+
+            return self.process_response(r, raw_response)
 
     def process_response(self, r, raw_response):
         if raw_response:
@@ -8,13 +8,33 @@ from . import rest
 class BaseSession(object):
     API_VERSION = 1
 
-    def __init__(self, api_host="api.banmayun.com", locale=None, time_zone=None, rest_client=rest.RESTClient):
+    def __init__(self, api_host="api.banmayun.com", locale=None, time_zone=None, rest_client=None,
+                 transport_options=None, scheme="http"):
+        if rest_client is not None and transport_options:
+            raise ValueError("transport_options cannot be used with an explicit rest_client")
+        if scheme not in ("http", "https"):
+            raise ValueError("scheme must be 'http' or 'https'")
+
         self.api_host = api_host
+        self.scheme = scheme
         self.locale = locale
         self.time_zone = time_zone
+        self._owns_rest_client = rest_client is None
+        if rest_client is None:
+            rest_client = rest.RESTClientObject(**(transport_options or {}))
         self.rest_client = rest_client
         self.link = None
 
+    def close(self):
+        if self._owns_rest_client:
+            self.rest_client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
+
     def set_link(self, link):
         self.link = link
 
@@ -45,7 +65,7 @@ class BaseSession(object):
             return "/%s%s" % (self.API_VERSION, target_path)
 
     def build_url(self, target, params=None):
-        return "http://%s%s" % (self.api_host, self.build_path(target, params))
+        return "%s://%s%s" % (self.scheme, self.api_host, self.build_path(target, params))
 
 
 class BanmayunSession(BaseSession):
@@ -0,0 +1,273 @@
+from __future__ import absolute_import
+
+import os
+import posixpath
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import transfer
+from .client import format_path
+from .index import TreeIndex
+
+STATE_FILE = '.banmayun-sync.db'
+PART_SUFFIX = '.banmayun-part'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_files (
+    sync_key TEXT NOT NULL,
+    path_key TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    local_md5 TEXT,
+    synced_md5 TEXT,
+    remote_version INTEGER,
+    PRIMARY KEY (sync_key, path_key)
+);
+"""
+
+
+class SyncResult(object):
+    def __init__(self):
+        self.uploaded = []
+        self.downloaded = []
+        self.deleted_local = []
+        self.deleted_remote = []
+        self.conflicts = []
+        self.conflict_copies = []
+        self.errors = []
+        self.hashed = 0
+        self.stats = transfer.TransferStats()
+
+    def __repr__(self):
+        return "SyncResult(uploaded=%d, downloaded=%d, deleted_local=%d, deleted_remote=%d, conflicts=%d, " \
+               "errors=%d, hashed=%d)" % (len(self.uploaded), len(self.downloaded), len(self.deleted_local),
+                                          len(self.deleted_remote), len(self.conflicts), len(self.errors),
+                                          self.hashed)
+
+
+class SyncState(object):
+    def __init__(self, db_path, sync_key):
+        self.sync_key = sync_key
+        self._conn = sqlite3.connect(db_path)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def load(self):
+        rows = self._conn.execute("SELECT * FROM sync_files WHERE sync_key = ?", (self.sync_key,)).fetchall()
+        return dict((row['path_key'], row) for row in rows)
+
+    def save(self, rel_path, size, mtime_ns, local_md5, synced_md5, remote_version):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_files (sync_key, path_key, rel_path, size, "
+                               "mtime_ns, local_md5, synced_md5, remote_version) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (self.sync_key, rel_path.lower(), rel_path, size, mtime_ns, local_md5,
+                                synced_md5, remote_version))
+
+    def delete(self, rel_path):
+        with self._conn:
+            self._conn.execute("DELETE FROM sync_files WHERE sync_key = ? AND path_key = ?",
+                               (self.sync_key, rel_path.lower()))
+
+
+def scan_local(local_dir, known, ignore=(STATE_FILE,)):
+    files = {}
+    hashed = 0
+    for dirpath, dirnames, filenames in os.walk(local_dir):
+        for name in filenames:
+            if name.endswith(PART_SUFFIX) or any(name.startswith(prefix) for prefix in ignore):
+                continue
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, local_dir).replace(os.sep, '/')
+            st = os.stat(full)
+
+            row = known.get(rel.lower())
+            if row is not None and row['size'] == st.st_size and row['mtime_ns'] == st.st_mtime_ns and \
+                    row['local_md5']:
+                md5 = row['local_md5']
+            else:
+                with open(full, 'rb') as f:
+                    md5, _ = transfer.file_md5(f)
+                hashed += 1
+            files[rel.lower()] = (rel, st.st_size, st.st_mtime_ns, md5)
+    return files, hashed
+
+
+def scan_remote(client, index, remote_path):
+    index.update(client)
+    base = format_path(remote_path) or ''
+    files = {}
+    for meta in index.iter_subtree(base):
+        if meta.get('is_dir'):
+            continue
+        rel = meta['path'][len(base) + 1:]
+        files[rel.lower()] = (rel, meta)
+    return files
+
+
+def plan(local, remote, state, prefer='newer'):
+    actions = []
+    for key in set(local) | set(remote) | set(state):
+        loc = local.get(key)
+        rem = remote.get(key)
+        row = state.get(key)
+        synced_md5 = row['synced_md5'] if row is not None else None
+
+        local_changed = loc is not None and loc[3] != synced_md5 or loc is None and row is not None
+        if rem is None:
+            remote_changed = row is not None
+        elif row is None:
+            remote_changed = True
+        else:
+            remote_md5 = rem[1].get('md5')
+            remote_changed = remote_md5 != synced_md5 if remote_md5 else \
+                rem[1].get('version') != row['remote_version']
+
+        if loc is not None and rem is not None and loc[3] == rem[1].get('md5'):
+            if row is None or local_changed or remote_changed:
+                actions.append(('record', key, loc, rem))
+        elif local_changed and remote_changed:
+            if loc is None and rem is None:
+                actions.append(('forget', key, loc, rem))
+            elif loc is None:
+                actions.append(('download', key, loc, rem))
+            elif rem is None:
+                actions.append(('upload', key, loc, rem))
+            else:
+                winner = _prefer(loc, rem, prefer)
+                actions.append(('conflict', key, loc, rem, winner))
+        elif local_changed:
+            actions.append(('upload' if loc is not None else 'delete_remote', key, loc, rem))
+        elif remote_changed:
+            actions.append(('download' if rem is not None else 'delete_local', key, loc, rem))
+    return actions
+
+
+def _prefer(loc, rem, prefer):
+    if prefer in ('local', 'remote'):
+        return prefer
+    local_millis = loc[2] // 1000000
+    return 'local' if local_millis >= (rem[1].get('modified_at_millis') or 0) else 'remote'
+
+
+def conflict_name(rel_path, stamp=None):
+    if stamp is None:
+        stamp = time.strftime('%Y-%m-%d %H%M%S')
+    base, ext = posixpath.splitext(rel_path)
+    return "%s (conflict %s)%s" % (base, stamp, ext)
+
+
+def sync_folder(client, local_dir, root_id, remote_path, state_path=None, max_workers=4, prefer='newer'):
+    if prefer not in ('newer', 'local', 'remote'):
+        raise ValueError("prefer must be 'newer', 'local' or 'remote'")
+    if state_path is None:
+        state_path = os.path.join(local_dir, STATE_FILE)
+
+    base = format_path(remote_path) or ''
+    result = SyncResult()
+    state = SyncState(state_path, "%s:%s" % (root_id, base.lower()))
+    index = TreeIndex(state_path, root_id)
+    try:
+        known = state.load()
+        local, result.hashed = scan_local(local_dir, known)
+        remote = scan_remote(client, index, base)
+        actions = plan(local, remote, known, prefer)
+
+        def upload(loc):
+            rel, size, mtime_ns, md5 = loc
+            meta = client.upload(root_id, base + '/' + rel, os.path.join(local_dir, *rel.split('/')),
+                                 modified_at_millis=mtime_ns // 1000000, overwrite=True)
+            result.stats.add(size)
+            return meta
+
+        def download(rem):
+            rel, meta = rem
+            target = os.path.join(local_dir, *rel.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = target + PART_SUFFIX
+            client.download_to(root_id, meta['path'], tmp, version=meta.get('version'))
+            if meta.get('modified_at_millis') is not None:
+                millis = meta['modified_at_millis']
+                os.utime(tmp, ns=(millis * 1000000, millis * 1000000))
+            os.replace(tmp, target)
+            result.stats.add(meta.get('bytes') or 0)
+            return os.stat(target)
+
+        def keep_conflict_copy(loc, rem, winner):
+            # the losing side is kept under a conflict name and picked up by the next sync
+            if winner == 'local':
+                copy = conflict_name(rem[0])
+                client.copy_file(root_id, rem[1]['path'], base + '/' + copy)
+            else:
+                copy = conflict_name(loc[0])
+                os.replace(os.path.join(local_dir, *loc[0].split('/')),
+                           os.path.join(local_dir, *copy.split('/')))
+            return copy
+
+        def run(action):
+            kind, key, loc, rem = action[:4]
+            if kind == 'conflict':
+                result.conflict_copies.append(keep_conflict_copy(loc, rem, action[4]))
+                kind = 'upload' if action[4] == 'local' else 'download'
+            if kind == 'upload':
+                return kind, upload(loc)
+            if kind == 'download':
+                return kind, download(rem)
+            if kind == 'delete_remote':
+                client.trash_file_by_path(root_id, rem[1]['path'])
+                return kind, None
+            if kind == 'delete_local':
+                try:
+                    os.remove(os.path.join(local_dir, *loc[0].split('/')))
+                except FileNotFoundError:
+                    pass
+                return kind, None
+            return kind, None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict((executor.submit(run, action), action) for action in actions)
+            for future in as_completed(futures):
+                action = futures[future]
+                kind, key, loc, rem = action[:4]
+                try:
+                    done, value = future.result()
+                except Exception as e:
+                    result.errors.append((key, e))
+                    continue
+
+                if action[0] == 'conflict':
+                    result.conflicts.append((loc or rem)[0])
+                if done == 'upload':
+                    state.save(loc[0], loc[1], loc[2], loc[3], loc[3], value.get('version'))
+                    result.uploaded.append(loc[0])
+                elif done == 'download':
+                    md5 = rem[1].get('md5')
+                    state.save(rem[0], value.st_size, value.st_mtime_ns, md5, md5, rem[1].get('version'))
+                    result.downloaded.append(rem[0])
+                elif done == 'record':
+                    state.save(loc[0], loc[1], loc[2], loc[3], loc[3], rem[1].get('version'))
+                else:
+                    rel = (loc or rem or (known[key]['rel_path'],))[0]
+                    state.delete(rel)
+                    if done == 'delete_remote':
+                        result.deleted_remote.append(rel)
+                    elif done == 'delete_local':
+                        result.deleted_local.append(rel)
+
+        for key, loc in local.items():
+            row = known.get(key)
+            if row is not None and (row['size'], row['mtime_ns']) != (loc[1], loc[2]) and \
+                    row['local_md5'] == loc[3]:
+                state.save(loc[0], loc[1], loc[2], loc[3], row['synced_md5'], row['remote_version'])
+    finally:
+        index.close()
+        state.close()
+
+    result.stats.finish()
+    return result
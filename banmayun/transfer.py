@@ -0,0 +1,437 @@
+from __future__ import absolute_import
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import urllib3
+
+
+def now_millis():
+    return int(time.time() * 1000)
+
+
+def file_md5(file_obj, block_size=1024 * 1024):
+    md5 = hashlib.md5()
+    size = 0
+    while True:
+        block = file_obj.read(block_size)
+        if not block:
+            break
+        md5.update(block)
+        size += len(block)
+    return md5.hexdigest(), size
+
+
+class MappedFile(object):
+    def __init__(self, path):
+        self.name = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self._mmap)
+        else:
+            self._mmap = None
+            self.view = memoryview(b'')
+        self.position = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        self.close()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            end = len(self.view)
+        else:
+            end = min(self.position + size, len(self.view))
+        chunk = self.view[self.position:end]
+        self.position = max(self.position, end)
+        return chunk
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += len(self.view)
+        if offset < 0:
+            raise ValueError("negative seek position %d" % offset)
+        self.position = offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def getbuffer(self):
+        return self.view
+
+    def close(self):
+        self.view.release()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+
+class TransferStats(object):
+    def __init__(self, total=None):
+        self.total = total
+        self.transferred = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.transferred += n
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def bytes_per_second(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.transferred / elapsed
+
+
+class SourceChangedError(Exception):
+    pass
+
+
+class TargetExistsError(Exception):
+    def __init__(self, full_path, meta):
+        Exception.__init__(self, "%s already exists and overwrite is False" % full_path)
+        self.full_path = full_path
+        self.meta = meta
+
+
+class ChunkedUploadState(object):
+    def __init__(self, upload_id=None, offset=0, total=None, chunks=None, record=None):
+        self.upload_id = upload_id
+        self.offset = offset
+        self.chunks = list(chunks or [])
+        self.stats = TransferStats(total)
+        self.record = record
+        self.journaled = None
+        self._done = {}
+
+    def ack(self, offset, length, md5=None):
+        self._done[offset] = (length, md5)
+        while self.offset in self._done:
+            length, md5 = self._done.pop(self.offset)
+            self.chunks.append((self.offset, length, md5))
+            self.offset += length
+
+
+class UploadJournal(object):
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        if not lines:
+            return None
+
+        record = json.loads(lines[0])
+        chunks = []
+        for line in lines[1:]:
+            try:
+                chunks.append(tuple(json.loads(line)))
+            except ValueError:
+                # a crash while appending leaves at most the last line torn
+                break
+        record['chunks'] = chunks
+        record['offset'] = chunks[-1][0] + chunks[-1][1] if chunks else 0
+        return record
+
+    def begin(self, record, chunks=()):
+        header = dict((key, value) for key, value in record.items() if key not in ('chunks', 'offset'))
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(header) + '\n')
+            f.writelines(json.dumps(list(chunk)) + '\n' for chunk in chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def append(self, chunks):
+        if not chunks:
+            return
+        with open(self.path, 'a') as f:
+            f.writelines(json.dumps(list(chunk)) + '\n' for chunk in chunks)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class ChunkedUploader(object):
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, client, chunk_size=CHUNK_SIZE, max_workers=4, progress=None, journal=None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        self.client = client
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.progress = progress
+        self.journal = journal
+
+    def upload(self, source, root_id, full_path, modified_at_millis=None):
+        if isinstance(source, str):
+            with MappedFile(source) as f:
+                return self.upload(f, root_id, full_path, modified_at_millis)
+
+        if not isinstance(source, MappedFile):
+            if modified_at_millis is None:
+                modified_at_millis = now_millis()
+            return self._commit(self.send(source), root_id, full_path, modified_at_millis)
+
+        st = os.fstat(source.fileno())
+        if modified_at_millis is None:
+            modified_at_millis = int(st.st_mtime * 1000)
+        record = None
+        # chunk offsets are journaled as file offsets, so only whole-file uploads can be resumed
+        if self.journal is not None and source.tell() == 0:
+            record = {'source': {'path': os.path.abspath(source.name),
+                                 'size': st.st_size,
+                                 'mtime_ns': st.st_mtime_ns},
+                      'root_id': root_id,
+                      'full_path': full_path,
+                      'modified_at_millis': modified_at_millis,
+                      'chunk_size': self.chunk_size}
+        state = ChunkedUploadState(total=_remaining_size(source), record=record)
+        return self._commit(self.send(source, state), root_id, full_path, modified_at_millis)
+
+    def resume(self):
+        if self.journal is None:
+            raise ValueError("resume requires a journal")
+        record = self.journal.load()
+        if record is None:
+            raise ValueError("no upload recorded in %s" % self.journal.path)
+
+        source = record['source']
+        with MappedFile(source['path']) as f:
+            st = os.fstat(f.fileno())
+            if st.st_size != source['size'] or st.st_mtime_ns != source['mtime_ns']:
+                raise SourceChangedError("%s changed since the upload started" % source['path'])
+
+            for offset, length, md5 in record['chunks']:
+                f.seek(offset)
+                if hashlib.md5(f.read(length)).hexdigest() != md5:
+                    raise SourceChangedError("%s changed at offset %d" % (source['path'], offset))
+
+            state = ChunkedUploadState(upload_id=record['upload_id'], offset=record['offset'],
+                                       total=source['size'] - record['offset'], chunks=record['chunks'],
+                                       record=record)
+            f.seek(state.offset)
+            self.journal.begin(record, state.chunks)
+            state.journaled = len(state.chunks)
+            return self._commit(self.send(f, state), record['root_id'], record['full_path'],
+                                record['modified_at_millis'])
+
+    def _commit(self, state, root_id, full_path, modified_at_millis):
+        resp = self.client.commit_chunked_upload(root_id, full_path, state.upload_id, modified_at_millis)
+        if state.record is not None:
+            # only the upload the journal describes may clear it
+            self.journal.clear()
+        return resp
+
+    def send(self, file_obj, state=None):
+        if state is None:
+            state = ChunkedUploadState(total=_remaining_size(file_obj))
+
+        if state.upload_id is None:
+            chunk = file_obj.read(self.chunk_size)
+            resp = self.client.chunked_upload(chunk)
+            state.upload_id = resp['id']
+            self._acked(state, 0, len(chunk), self._checksum(state, chunk))
+
+        offset = state.offset
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while True:
+                    chunk = file_obj.read(self.chunk_size)
+                    if not chunk:
+                        break
+
+                    while len(pending) >= self.max_workers:
+                        self._drain(state, pending)
+
+                    future = executor.submit(self.client.chunked_upload, chunk, state.upload_id, offset)
+                    pending[future] = (offset, len(chunk), self._checksum(state, chunk))
+                    offset += len(chunk)
+
+                while pending:
+                    self._drain(state, pending)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+        state.stats.finish()
+        return state
+
+    def _drain(self, state, pending):
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            offset, length, md5 = pending.pop(future)
+            future.result()
+            self._acked(state, offset, length, md5)
+
+    def _checksum(self, state, chunk):
+        if state.record is None:
+            return None
+        return hashlib.md5(chunk).hexdigest()
+
+    def _acked(self, state, offset, length, md5=None):
+        state.ack(offset, length, md5)
+        state.stats.add(length)
+        if state.record is not None:
+            if state.journaled is None:
+                state.record['upload_id'] = state.upload_id
+                self.journal.begin(state.record)
+                state.journaled = 0
+            self.journal.append(state.chunks[state.journaled:])
+            state.journaled = len(state.chunks)
+        if self.progress is not None:
+            self.progress(state)
+
+
+class IncompleteRangeError(IOError):
+    pass
+
+
+class RangedDownloader(object):
+    RANGE_SIZE = 8 * 1024 * 1024
+    BLOCK_SIZE = 256 * 1024
+
+    def __init__(self, client, range_size=RANGE_SIZE, max_workers=4, retries=3, progress=None):
+        if range_size <= 0:
+            raise ValueError("range_size must be positive")
+        if max_workers <= 0:
+            raise ValueError("max_workers must be positive")
+
+        self.client = client
+        self.range_size = range_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.progress = progress
+
+    def download(self, root_id, full_path, dest_path, version=None):
+        meta = self.client.get_meta(root_id, full_path)
+        if version is None:
+            version = meta.get('version')
+        size = meta['bytes']
+
+        stats = TransferStats(size)
+        with open(dest_path, 'wb') as f:
+            f.truncate(size)
+            fd = f.fileno()
+            lock = threading.Lock()
+
+            def fetch(offset, length):
+                attempt = 0
+                while True:
+                    try:
+                        return self._fetch_range(root_id, full_path, version, offset, length, fd, lock, stats)
+                    except IncompleteRangeError:
+                        # failed requests are already retried by the client's RetryPolicy, so only a body
+                        # that broke off part way is fetched again here
+                        attempt += 1
+                        if attempt > self.retries:
+                            raise
+
+            ranges = [(offset, min(self.range_size, size - offset))
+                      for offset in range(0, size, self.range_size)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(fetch, offset, length) for offset, length in ranges]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+        stats.finish()
+        return meta
+
+    def _fetch_range(self, root_id, full_path, version, offset, length, fd, lock, stats):
+        resp = self.client.get_file_by_path(root_id, full_path, version=version, offset=offset, bytes_=length)
+        buf = bytearray(min(self.BLOCK_SIZE, length))
+        view = memoryview(buf)
+        received = 0
+        try:
+            while received < length:
+                try:
+                    n = resp.readinto(view[:length - received])
+                except (OSError, urllib3.exceptions.HTTPError) as e:
+                    raise IncompleteRangeError("reading %d bytes at offset %d failed after %d: %s" %
+                                               (length, offset, received, e))
+                if not n:
+                    break
+                _pwrite(fd, view[:n], offset + received, lock)
+                received += n
+                stats.add(n)
+                if self.progress is not None:
+                    self.progress(stats)
+
+            if received != length:
+                raise IncompleteRangeError("expected %d bytes at offset %d, got %d" %
+                                           (length, offset, received))
+        except BaseException:
+            stats.add(-received)
+            raise
+        finally:
+            resp.close()
+
+
+def _pwrite(fd, data, offset, lock):
+    view = memoryview(data)
+    if hasattr(os, 'pwrite'):
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while view:
+                view = view[os.write(fd, view):]
+
+
+def _remaining_size(file_obj):
+    try:
+        return os.fstat(file_obj.fileno()).st_size - file_obj.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,211 @@
+from __future__ import absolute_import
+
+import ssl
+import threading
+import weakref
+
+import urllib3
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def _dead_ref():
+    return None
+
+
+class _ResumableSSLSocket(ssl.SSLSocket):
+    def _real_close(self):
+        if self.server_hostname is not None and not self.server_side:
+            try:
+                session = self.session
+            except (AttributeError, ValueError):
+                session = None
+            if session is not None:
+                self.context._save_session(self.server_hostname, session)
+        super()._real_close()
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    def __new__(cls, protocol=ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        self = super().__new__(cls, protocol, *args, **kwargs)
+        self.sslsocket_class = _ResumableSSLSocket
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        return self
+
+    def _session_for(self, server_hostname):
+        with self._sessions_lock:
+            entry = self._sessions.get(server_hostname)
+        if entry is None:
+            return None
+
+        ref, session = entry
+        conn = ref()
+        if conn is not None and (session is None or not session.has_ticket):
+            # TLS 1.3 tickets arrive after the handshake, so pick up the freshest session lazily.
+            try:
+                latest = conn.session
+            except (AttributeError, ValueError):
+                latest = None
+            if latest is not None:
+                session = latest
+                with self._sessions_lock:
+                    self._sessions[server_hostname] = (ref, session)
+        return session
+
+    def _save_session(self, server_hostname, session):
+        with self._sessions_lock:
+            ref = self._sessions.get(server_hostname, (_dead_ref, None))[0]
+            self._sessions[server_hostname] = (ref, session)
+
+    def _remember(self, server_hostname, conn):
+        try:
+            session = conn.session
+        except (AttributeError, ValueError):
+            session = None
+        with self._sessions_lock:
+            self._sessions[server_hostname] = (weakref.ref(conn), session)
+
+    def forget_sessions(self):
+        with self._sessions_lock:
+            self._sessions.clear()
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True, suppress_ragged_eofs=True,
+                    server_hostname=None, session=None):
+        resumable = not server_side and server_hostname is not None
+        if resumable and session is None:
+            session = self._session_for(server_hostname)
+        conn = super().wrap_socket(sock, server_side=server_side,
+                                   do_handshake_on_connect=do_handshake_on_connect,
+                                   suppress_ragged_eofs=suppress_ragged_eofs,
+                                   server_hostname=server_hostname, session=session)
+        if resumable:
+            self._remember(server_hostname, conn)
+        return conn
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        resumable = not server_side and server_hostname is not None
+        if resumable and session is None:
+            session = self._session_for(server_hostname)
+        conn = super().wrap_bio(incoming, outgoing, server_side=server_side,
+                                server_hostname=server_hostname, session=session)
+        if resumable:
+            self._remember(server_hostname, conn)
+        return conn
+
+
+def create_ssl_context(cafile=None, capath=None, cadata=None):
+    context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    if cafile or capath or cadata:
+        context.load_verify_locations(cafile, capath, cadata)
+    else:
+        context.load_default_certs()
+    return context
+
+
+class HTTP2Response(object):
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = bytearray()
+        self._exhausted = False
+        self.status = response.status_code
+        self.version = 20 if response.http_version == 'HTTP/2' else 11
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+
+    def _fill(self, amt):
+        try:
+            while not self._exhausted and (amt is None or len(self._buffer) < amt):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    self._exhausted = True
+                else:
+                    self._buffer += chunk
+        except httpx.TimeoutException as e:
+            raise urllib3.exceptions.ReadTimeoutError(None, str(self._response.url), str(e))
+        except (httpx.TransportError, httpx.StreamError) as e:
+            raise urllib3.exceptions.ProtocolError(str(e), e)
+
+    def read(self, amt=None):
+        self._fill(amt)
+        if amt is None or amt >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        else:
+            data = bytes(self._buffer[:amt])
+            del self._buffer[:amt]
+        return data
+
+    def readinto(self, b):
+        view = memoryview(b).cast('B')
+        self._fill(len(view))
+        n = min(len(view), len(self._buffer))
+        view[:n] = self._buffer[:n]
+        del self._buffer[:n]
+        return n
+
+    def getheaders(self):
+        return self.headers
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def fileno(self):
+        raise OSError("HTTP/2 responses are multiplexed and have no file descriptor")
+
+    def drain_conn(self):
+        self._buffer.clear()
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+
+def _content(body, block_size=64 * 1024):
+    if body is None or isinstance(body, (str, bytes)):
+        return body
+    if isinstance(body, memoryview):
+        return (bytes(body[i:i + block_size]) for i in range(0, body.nbytes, block_size))
+    if hasattr(body, 'read'):
+        return iter(lambda: bytes(body.read(block_size)), b'')
+    return body
+
+
+class HTTP2Transport(object):
+    def __init__(self, http2=True, max_connections=10, connect_timeout=10.0, read_timeout=60.0,
+                 ssl_context=None):
+        if httpx is None:
+            raise ImportError("HTTP2Transport requires httpx; install it with: pip install 'httpx[http2]'")
+
+        if ssl_context is None:
+            ssl_context = create_ssl_context()
+        self.client = httpx.Client(
+            http2=http2,
+            verify=ssl_context,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    def urlopen(self, method, url, body=None, headers=None, preload_content=False, retries=False, **kwargs):
+        request = self.client.build_request(method, url, headers=headers, content=_content(body))
+        try:
+            response = self.client.send(request, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise urllib3.exceptions.NewConnectionError(None, str(e))
+        except httpx.TimeoutException as e:
+            raise urllib3.exceptions.ReadTimeoutError(None, url, str(e))
+        except httpx.TransportError as e:
+            raise urllib3.exceptions.ProtocolError(str(e), e)
+
+        r = HTTP2Response(response)
+        if preload_content:
+            r._fill(None)
+        return r
+
+    def clear(self):
+        self.client.close()
@@ -0,0 +1,78 @@
+from __future__ import absolute_import
+
+import asyncio
+import fnmatch
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .paging import page_entries
+
+
+def _matches(name, patterns):
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def _split(page, include, exclude):
+    dirs = []
+    files = []
+    for meta in page_entries(page):
+        name = meta.get('name') or meta['path'].rsplit('/', 1)[-1]
+        if exclude is not None and _matches(name, exclude):
+            continue
+        if meta.get('is_dir'):
+            dirs.append(meta)
+        elif include is None or _matches(name, include):
+            files.append(meta)
+    return dirs, files
+
+
+def walk(client, root_id, full_path, max_workers=8, max_depth=None, include=None, exclude=None):
+    if max_workers <= 0:
+        raise ValueError("max_workers must be positive")
+
+    def expand(path, depth):
+        dirs, files = _split(client.list_folder(root_id, path), include, exclude)
+        return path, depth, dirs, files
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set([executor.submit(expand, full_path, 0)])
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, depth, dirs, files = future.result()
+                    yield path, dirs, files
+                    if max_depth is None or depth < max_depth:
+                        for meta in dirs:
+                            pending.add(executor.submit(expand, meta['path'], depth + 1))
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+async def awalk(client, root_id, full_path, max_workers=8, max_depth=None, include=None, exclude=None):
+    if max_workers <= 0:
+        raise ValueError("max_workers must be positive")
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def expand(path, depth):
+        async with semaphore:
+            page = await client.list_folder(root_id, path)
+        dirs, files = _split(page, include, exclude)
+        return path, depth, dirs, files
+
+    pending = set([asyncio.ensure_future(expand(full_path, 0))])
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                path, depth, dirs, files = future.result()
+                yield path, dirs, files
+                if max_depth is None or depth < max_depth:
+                    for meta in dirs:
+                        pending.add(asyncio.ensure_future(expand(meta['path'], depth + 1)))
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+
+from .client import delta_cursor_id, delta_entries
+
+
+class ChangeBatch(object):
+    def __init__(self, root_id, cursor_id, changes, reset=False):
+        self.root_id = root_id
+        self.cursor_id = cursor_id
+        self.changes = changes
+        self.reset = reset
+
+    def __len__(self):
+        return len(self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __repr__(self):
+        return "ChangeBatch(root_id=%r, cursor_id=%r, changes=%d, reset=%r)" % \
+               (self.root_id, self.cursor_id, len(self.changes), self.reset)
+
+
+class DeltaWatcher(object):
+    def __init__(self, client, root_id, cursor_id=None, callback=None, queue=None, on_error=None,
+                 min_interval=1.0, max_interval=60.0, backoff=2.0, max_batch=1000):
+        if callback is None and queue is None:
+            raise ValueError("either callback or queue is required")
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("intervals must satisfy 0 < min_interval <= max_interval")
+
+        self.client = client
+        self.root_id = root_id
+        self.cursor_id = cursor_id
+        self.callback = callback
+        self.queue = queue
+        self.on_error = on_error
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_batch = max_batch
+        self.interval = min_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        delivered = 0
+        changes = OrderedDict()
+        reset = False
+        cursor_id = self.cursor_id
+
+        while True:
+            delta = self.client.delta(self.root_id, cursor_id)
+            if delta.get('reset'):
+                changes.clear()
+                reset = True
+            for path, meta in delta_entries(delta):
+                key = path.lower()
+                changes.pop(key, None)
+                changes[key] = (path, meta)
+            cursor_id = delta_cursor_id(delta)
+            has_more = bool(delta.get('has_more'))
+
+            if (changes or reset) and (len(changes) >= self.max_batch or not has_more):
+                self._deliver(ChangeBatch(self.root_id, cursor_id, list(changes.values()), reset))
+                delivered += len(changes)
+                changes = OrderedDict()
+                reset = False
+            if not changes and not reset:
+                self.cursor_id = cursor_id
+
+            if not has_more or self._stop.is_set():
+                return delivered
+
+    def _deliver(self, batch):
+        if self.callback is not None:
+            self.callback(batch)
+        if self.queue is not None:
+            self.queue.put(batch)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                delivered = self.poll()
+            except Exception as e:
+                if self.on_error is None:
+                    raise
+                self.on_error(e)
+                delivered = 0
+                self.interval = self.max_interval
+
+            if delivered:
+                self.interval = self.min_interval
+                continue
+            self._stop.wait(self.interval)
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("watcher already started")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="DeltaWatcher-%s" % self.root_id)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
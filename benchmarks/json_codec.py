@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+from __future__ import absolute_import
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from banmayun import codec  # noqa: E402
+
+
+def make_meta(rng, i):
+    name = "%s-%05d.%s" % (rng.choice([u'report', u'照片', u'设计稿', u'backup', u'notes']), i,
+                           rng.choice(['pdf', 'jpg', 'docx', 'txt']))
+    folder = "/projects/%s/%s" % (rng.choice([u'alpha', u'beta', u'市场部']), rng.randint(1, 40))
+    is_dir = rng.random() < 0.1
+    return {
+        'id': "%032x" % rng.getrandbits(128),
+        'root_id': 'r1',
+        'path': "%s/%s" % (folder, name),
+        'name': name,
+        'is_dir': is_dir,
+        'is_deleted': False,
+        'version': rng.randint(1, 50),
+        'bytes': 0 if is_dir else rng.randint(0, 1 << 31),
+        'size': '%d KB' % rng.randint(1, 99999),
+        'md5': None if is_dir else "%032x" % rng.getrandbits(128),
+        'created_at_millis': 1400000000000 + rng.randint(0, 10 ** 10),
+        'modified_at_millis': 1400000000000 + rng.randint(0, 10 ** 10),
+        'client_modified_at_millis': 1400000000000 + rng.randint(0, 10 ** 10),
+        'permission': {'insertable_to_owners': True, 'readable_to_owners': True, 'writable_to_owners': True},
+    }
+
+
+def make_payloads(entries, seed=0):
+    rng = random.Random(seed)
+    metas = [make_meta(rng, i) for i in range(entries)]
+    list_folder = {'total': entries, 'offset': 0, 'entries': metas}
+    delta = {'reset': False, 'has_more': True, 'cursor': {'id': 'c%d' % entries},
+             'entries': [{'path': meta['path'].lower(), 'meta': None if i % 7 == 0 else meta}
+                         for i, meta in enumerate(metas)]}
+    return {'list_folder': list_folder, 'delta': delta}
+
+
+def bench(payload, number, repeat):
+    encoded = codec.get_codec().dumpb(payload)
+    decode = min(timeit.repeat(lambda: codec.loadb(encoded), number=number, repeat=repeat)) / number
+    encode = min(timeit.repeat(lambda: codec.dumpb(payload), number=number, repeat=repeat)) / number
+    return decode, encode, len(encoded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON codecs on delta/list_folder payloads.")
+    parser.add_argument('--entries', type=int, default=1000, help="entries per payload")
+    parser.add_argument('--number', type=int, default=20, help="calls per timing run")
+    parser.add_argument('--repeat', type=int, default=5, help="timing runs; the best one is reported")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.entries)
+    results = {}
+    print("%-8s %-12s %10s %10s %10s" % ('codec', 'payload', 'decode ms', 'encode ms', 'bytes'))
+    for name in codec.available_codecs():
+        codec.set_codec(name)
+        for kind, payload in sorted(payloads.items()):
+            decode, encode, size = bench(payload, args.number, args.repeat)
+            results[(name, kind)] = decode
+            print("%-8s %-12s %10.3f %10.3f %10d" % (name, kind, decode * 1000, encode * 1000, size))
+
+    for name in codec.available_codecs():
+        if name == 'json':
+            continue
+        for kind in sorted(payloads):
+            print("%s decodes %s %.1fx faster than json" %
+                  (name, kind, results[('json', kind)] / results[(name, kind)]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import unittest
+
+from banmayun.cache import MetaCache
+
+
+class MetaCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = MetaCache()
+
+    def test_get_returns_a_copy(self):
+        meta = {'path': '/a', 'permission': {'read': True}}
+        self.cache.put('r1', '/a', 'meta', meta)
+        meta['path'] = '/changed'
+
+        cached = self.cache.get('r1', '/a', 'meta')
+        cached['permission']['read'] = False
+        self.assertEqual({'path': '/a', 'permission': {'read': True}}, self.cache.get('r1', '/a', 'meta'))
+
+    def test_file_invalidation_drops_the_parent_listing_only(self):
+        self.cache.put('r1', '/d', 'meta', {'path': '/d'})
+        self.cache.put('r1', '/d', 'list', [{'path': '/d/f'}])
+        self.cache.put('r1', '/d/f', 'meta', {'path': '/d/f'})
+        self.cache.put('r1', '/d/g', 'meta', {'path': '/d/g'})
+
+        self.cache.invalidate('r1', '/d/f')
+        self.assertIsNone(self.cache.get('r1', '/d/f', 'meta'))
+        self.assertIsNone(self.cache.get('r1', '/d', 'list'))
+        self.assertIsNotNone(self.cache.get('r1', '/d', 'meta'))
+        self.assertIsNotNone(self.cache.get('r1', '/d/g', 'meta'))
+
+    def test_recursive_invalidation_spares_prefix_siblings_and_other_roots(self):
+        for path in ('/a', '/a/b', '/a/b/c', '/a0', '/a.txt'):
+            self.cache.put('r1', path, 'meta', {'path': path})
+        self.cache.put('r2', '/a/b', 'meta', {'path': '/a/b'})
+
+        self.cache.invalidate('r1', '/A', recursive=True)
+        self.assertEqual(['/a.txt', '/a0'], sorted(p for p in ('/a', '/a/b', '/a/b/c', '/a0', '/a.txt')
+                                                   if self.cache.get('r1', p, 'meta') is not None))
+        self.assertIsNotNone(self.cache.get('r2', '/a/b', 'meta'))
+
+    def test_eviction_and_invalidate_root_keep_the_path_index_consistent(self):
+        cache = MetaCache(max_entries=2)
+        for path in ('/x', '/y', '/z'):
+            cache.put('r1', path, 'meta', {'path': path})
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('r1', '/x', 'meta'))
+
+        cache.invalidate_root('r1')
+        self.assertEqual(0, len(cache))
+        cache.invalidate('r1', '/y', recursive=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from banmayun.index import DELETE_SUBTREE, SELECT_SUBTREE, TreeIndex
+
+
+def _meta(path, is_dir=False):
+    return {'path': path, 'is_dir': is_dir, 'version': 1}
+
+
+class TreeIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TreeIndex(':memory:', 'r1')
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_file_replacing_folder_removes_only_its_subtree(self):
+        self.index.apply_delta({'cursor': {'id': 'c1'}, 'entries': [
+            {'path': '/a', 'meta': _meta('/a', True)},
+            {'path': '/a/b', 'meta': _meta('/a/b', True)},
+            {'path': '/a/b/c', 'meta': _meta('/a/b/c')},
+            {'path': '/a/b0', 'meta': _meta('/a/b0')},
+            {'path': '/a/b.txt', 'meta': _meta('/a/b.txt')},
+        ]})
+        self.index.apply_delta({'cursor': {'id': 'c2'}, 'entries': [{'path': '/a/b', 'meta': _meta('/a/b')}]})
+
+        self.assertIsNone(self.index.get_meta('/a/b/c'))
+        self.assertEqual(['/a/b', '/a/b.txt', '/a/b0'],
+                         sorted(m['path'] for m in self.index.iter_subtree('/a')))
+
+    def test_iter_subtree_excludes_siblings_sharing_a_prefix(self):
+        self.index.apply_delta({'cursor': {'id': 'c1'}, 'entries': [
+            {'path': '/x', 'meta': _meta('/x', True)},
+            {'path': '/x/1', 'meta': _meta('/x/1')},
+            {'path': '/x0', 'meta': _meta('/x0')},
+            {'path': '/x.d', 'meta': _meta('/x.d', True)},
+            {'path': '/x.d/2', 'meta': _meta('/x.d/2')},
+        ]})
+
+        self.assertEqual(['/x/1'], [m['path'] for m in self.index.iter_subtree('/x')])
+
+    def _plan(self, sql, params):
+        return [row[3] for row in self.index._conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    def test_subtree_update_uses_the_primary_key_range(self):
+        for detail in (self._plan(DELETE_SUBTREE, (1, 'r1', '/a/', '/a0')),
+                       self._plan(SELECT_SUBTREE, ('r1', '/a/', '/a0'))):
+            self.assertEqual(1, len(detail))
+            self.assertTrue(detail[0].startswith('SEARCH metas USING'), detail)
+            self.assertIn('(root_id=? AND path_lower>? AND path_lower<?)', detail[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
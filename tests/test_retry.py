@@ -0,0 +1,124 @@
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+import urllib3
+
+from banmayun.rest import ErrorResponse, RESTClientObject, RESTSocketError, RetryBudget, RetryPolicy
+
+API = 'https://api.banmayun.com/1'
+
+
+def _response(status=200, body=b'{}', headers=None):
+    return urllib3.HTTPResponse(body=io.BytesIO(body), status=status, headers=headers or {},
+                                preload_content=False)
+
+
+class FakeUrlopen(object):
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.bodies = []
+
+    def __call__(self, method, url, body=None, headers=None, **kwargs):
+        if hasattr(body, 'read'):
+            body = body.read()
+        self.bodies.append(body)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome() if callable(outcome) else outcome
+
+    @property
+    def calls(self):
+        return len(self.bodies)
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('banmayun.rest.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _client(self, urlopen, **kwargs):
+        kwargs.setdefault('jitter', False)
+        kwargs.setdefault('backoff_factor', 0.1)
+        return RESTClientObject(mock_urlopen=urlopen, retry_policy=RetryPolicy(**kwargs))
+
+    def test_sent_non_idempotent_post_is_not_replayed(self):
+        urlopen = FakeUrlopen(urllib3.exceptions.ProtocolError('connection reset'), lambda: _response())
+        client = self._client(urlopen)
+
+        self.assertRaises(RESTSocketError, client.POST, API + '/fileops/create_folder?root_id=r&path=/a')
+        self.assertEqual(1, urlopen.calls)
+        self.assertEqual(0, client.retry_policy.stats['retries'])
+
+    def test_non_idempotent_post_is_not_retried_on_503(self):
+        urlopen = FakeUrlopen(lambda: _response(503), lambda: _response())
+        client = self._client(urlopen)
+
+        self.assertRaises(ErrorResponse, client.POST, API + '/fileops/create_folder?root_id=r&path=/a')
+        self.assertEqual(1, urlopen.calls)
+
+    def test_unsent_post_is_retried_after_connect_timeout(self):
+        urlopen = FakeUrlopen(urllib3.exceptions.ConnectTimeoutError('timed out'),
+                              lambda: _response(body=b'{"ok": true}'))
+        client = self._client(urlopen)
+
+        self.assertEqual({'ok': True}, client.POST(API + '/fileops/create_folder?root_id=r&path=/a'))
+        self.assertEqual(2, urlopen.calls)
+
+    def test_safe_post_is_retried_on_503_honouring_retry_after(self):
+        urlopen = FakeUrlopen(lambda: _response(503, headers={'Retry-After': '2'}),
+                              lambda: _response(body=b'{"path": "/a"}'))
+        client = self._client(urlopen)
+
+        self.assertEqual({'path': '/a'}, client.POST(API + '/fileops/get_meta?root_id=r&path=/a'))
+        self.assertEqual(2, urlopen.calls)
+        self.sleep.assert_called_once_with(2.0)
+        self.assertEqual(1, client.retry_policy.stats['retries'])
+
+    def test_retries_stop_when_the_budget_runs_out(self):
+        urlopen = FakeUrlopen(lambda: _response(503))
+        budget = RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=1.0)
+        client = self._client(urlopen, max_retries=5, budget=budget)
+
+        self.assertRaises(ErrorResponse, client.GET, API + '/users')
+        self.assertEqual(2, urlopen.calls)
+        self.assertEqual(1, client.retry_policy.stats['budget_exhausted'])
+
+    def test_retries_stop_after_max_retries(self):
+        urlopen = FakeUrlopen(lambda: _response(503))
+        client = self._client(urlopen, max_retries=2)
+
+        self.assertRaises(ErrorResponse, client.GET, API + '/users')
+        self.assertEqual(3, urlopen.calls)
+        self.assertEqual(1, client.retry_policy.stats['exhausted'])
+
+    def test_iterator_bodies_are_never_retried(self):
+        urlopen = FakeUrlopen(lambda: _response(503), lambda: _response())
+        client = self._client(urlopen)
+
+        self.assertRaises(ErrorResponse, client.PUT, API + '/roots/r/files/p/a', body=iter([b'ab', b'cd']))
+        self.assertEqual(1, urlopen.calls)
+
+        urlopen = FakeUrlopen(urllib3.exceptions.ProtocolError('connection reset'), lambda: _response())
+        client = self._client(urlopen)
+        self.assertRaises(RESTSocketError, client.PUT, API + '/roots/r/files/p/a', body=iter([b'ab']))
+        self.assertEqual(1, urlopen.calls)
+
+    def test_file_bodies_are_rewound_between_attempts(self):
+        urlopen = FakeUrlopen(lambda: _response(503), urllib3.exceptions.ProtocolError('connection reset'),
+                              lambda: _response())
+        client = self._client(urlopen)
+
+        with tempfile.TemporaryFile() as f:
+            f.write(b'header|payload')
+            f.seek(7)
+            client.PUT(API + '/roots/r/files/p/a', body=f)
+
+        self.assertEqual([b'payload', b'payload', b'payload'], urlopen.bodies)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+from banmayun.sync import conflict_name, plan
+
+
+def _local(rel, md5, mtime_ns=1000000000):
+    return rel.lower(), (rel, 10, mtime_ns, md5)
+
+
+def _remote(rel, md5, version=1, modified_at_millis=1000):
+    return rel.lower(), (rel, {'path': '/base/' + rel, 'md5': md5, 'version': version,
+                               'modified_at_millis': modified_at_millis})
+
+
+def _row(rel, md5, version=1, mtime_ns=1000000000):
+    return rel.lower(), {'rel_path': rel, 'size': 10, 'mtime_ns': mtime_ns, 'local_md5': md5,
+                         'synced_md5': md5, 'remote_version': version}
+
+
+def _kinds(actions):
+    return sorted((action[0], action[1]) for action in actions)
+
+
+class PlanTest(unittest.TestCase):
+    def test_first_sync(self):
+        local = dict([_local('up.txt', 'a'), _local('same.txt', 's'), _local('both.txt', 'l')])
+        remote = dict([_remote('down.txt', 'b'), _remote('same.txt', 's'), _remote('both.txt', 'r')])
+
+        actions = plan(local, remote, {})
+        self.assertEqual([('conflict', 'both.txt'), ('download', 'down.txt'), ('record', 'same.txt'),
+                          ('upload', 'up.txt')], _kinds(actions))
+
+    def test_unchanged_files_need_no_action(self):
+        local = dict([_local('a.txt', 'a')])
+        remote = dict([_remote('a.txt', 'a')])
+        state = dict([_row('a.txt', 'a')])
+
+        self.assertEqual([], plan(local, remote, state))
+
+    def test_local_only_edit_is_uploaded(self):
+        local = dict([_local('a.txt', 'new')])
+        remote = dict([_remote('a.txt', 'old')])
+        state = dict([_row('a.txt', 'old')])
+
+        self.assertEqual([('upload', 'a.txt')], _kinds(plan(local, remote, state)))
+
+    def test_remote_only_edit_is_downloaded(self):
+        local = dict([_local('a.txt', 'old')])
+        remote = dict([_remote('a.txt', 'new', version=2)])
+        state = dict([_row('a.txt', 'old')])
+
+        self.assertEqual([('download', 'a.txt')], _kinds(plan(local, remote, state)))
+
+    def test_remote_edit_without_md5_is_detected_by_version(self):
+        local = dict([_local('a.txt', 'old')])
+        remote = dict([_remote('a.txt', None, version=2)])
+        state = dict([_row('a.txt', 'old', version=1)])
+
+        self.assertEqual([('download', 'a.txt')], _kinds(plan(local, remote, state)))
+
+    def test_local_delete_deletes_remote(self):
+        remote = dict([_remote('a.txt', 'a')])
+        state = dict([_row('a.txt', 'a')])
+
+        self.assertEqual([('delete_remote', 'a.txt')], _kinds(plan({}, remote, state)))
+
+    def test_remote_delete_deletes_local(self):
+        local = dict([_local('a.txt', 'a')])
+        state = dict([_row('a.txt', 'a')])
+
+        self.assertEqual([('delete_local', 'a.txt')], _kinds(plan(local, {}, state)))
+
+    def test_delete_on_both_sides_is_forgotten(self):
+        state = dict([_row('a.txt', 'a')])
+
+        self.assertEqual([('forget', 'a.txt')], _kinds(plan({}, {}, state)))
+
+    def test_local_edit_wins_over_remote_delete(self):
+        local = dict([_local('a.txt', 'new')])
+        state = dict([_row('a.txt', 'old')])
+
+        self.assertEqual([('upload', 'a.txt')], _kinds(plan(local, {}, state)))
+
+    def test_both_changed_is_a_conflict_won_by_the_newer_side(self):
+        state = dict([_row('a.txt', 'old')])
+        remote = dict([_remote('a.txt', 'remote', version=2, modified_at_millis=5000)])
+
+        older_local = dict([_local('a.txt', 'local', mtime_ns=2000 * 1000000)])
+        self.assertEqual([('conflict', 'a.txt', 'remote')], [(a[0], a[1], a[4]) for a in
+                                                             plan(older_local, remote, state)])
+
+        newer_local = dict([_local('a.txt', 'local', mtime_ns=9000 * 1000000)])
+        self.assertEqual([('conflict', 'a.txt', 'local')], [(a[0], a[1], a[4]) for a in
+                                                            plan(newer_local, remote, state)])
+
+    def test_conflict_preference_overrides_timestamps(self):
+        state = dict([_row('a.txt', 'old')])
+        local = dict([_local('a.txt', 'local', mtime_ns=9000 * 1000000)])
+        remote = dict([_remote('a.txt', 'remote', version=2, modified_at_millis=5000)])
+
+        self.assertEqual('remote', plan(local, remote, state, prefer='remote')[0][4])
+
+    def test_touched_file_with_same_content_is_not_transferred(self):
+        local = dict([_local('a.txt', 'a', mtime_ns=5000000000)])
+        remote = dict([_remote('a.txt', 'a')])
+        state = dict([_row('a.txt', 'a', mtime_ns=1000000000)])
+
+        self.assertEqual([], plan(local, remote, state))
+
+    def test_both_changed_to_same_content_is_only_recorded(self):
+        local = dict([_local('a.txt', 'new')])
+        remote = dict([_remote('a.txt', 'new', version=2)])
+        state = dict([_row('a.txt', 'old')])
+
+        self.assertEqual([('record', 'a.txt')], _kinds(plan(local, remote, state)))
+
+
+class ConflictNameTest(unittest.TestCase):
+    def test_conflict_name_keeps_folder_and_extension(self):
+        self.assertEqual('docs/report (conflict 2024-01-02 030405).txt',
+                         conflict_name('docs/report.txt', '2024-01-02 030405'))
+        self.assertEqual('Makefile (conflict x)', conflict_name('Makefile', 'x'))
+
+
+if __name__ == '__main__':
+    unittest.main()
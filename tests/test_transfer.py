@@ -0,0 +1,158 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import urllib3
+
+from banmayun.rest import RESTSocketError
+from banmayun.transfer import (ChunkedUploader, IncompleteRangeError, MappedFile, RangedDownloader,
+                               UploadJournal)
+
+
+class FakeUploadClient(object):
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.uploads = {}
+        self.committed = []
+
+    def chunked_upload(self, chunk, upload_id=None, offset=None):
+        offset = offset or 0
+        if self.fail_at is not None and offset >= self.fail_at:
+            self.fail_at = None
+            raise IOError("connection reset")
+        if upload_id is None:
+            upload_id = 'u%d' % (len(self.uploads) + 1)
+            self.uploads[upload_id] = bytearray()
+        data = self.uploads[upload_id]
+        data[offset:offset + len(chunk)] = bytes(chunk)
+        return {'id': upload_id, 'offset': offset + len(chunk)}
+
+    def commit_chunked_upload(self, root_id, full_path, upload_id, modified_at_millis):
+        self.committed.append((full_path, bytes(self.uploads[upload_id])))
+        return {'path': full_path, 'bytes': len(self.uploads[upload_id])}
+
+
+class ChunkedUploaderJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'src.bin')
+        self.data = os.urandom(200)
+        with open(self.source, 'wb') as f:
+            f.write(self.data)
+        self.journal = UploadJournal(os.path.join(self.tmpdir, 'upload.journal'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume_after_failed_path_upload(self):
+        client = FakeUploadClient(fail_at=100)
+        uploader = ChunkedUploader(client, chunk_size=50, max_workers=1, journal=self.journal)
+        self.assertRaises(IOError, uploader.upload, self.source, 'r1', '/src.bin')
+        self.assertEqual(100, self.journal.load()['offset'])
+
+        uploader.resume()
+        self.assertEqual([('/src.bin', self.data)], client.committed)
+        self.assertIsNone(self.journal.load())
+
+    def test_stream_upload_keeps_journal_of_failed_path_upload(self):
+        client = FakeUploadClient(fail_at=50)
+        uploader = ChunkedUploader(client, chunk_size=50, max_workers=1, journal=self.journal)
+        self.assertRaises(IOError, uploader.upload, self.source, 'r1', '/src.bin')
+
+        uploader.upload(io.BytesIO(b'x' * 120), 'r1', '/other.bin')
+        record = self.journal.load()
+        self.assertEqual('/src.bin', record['full_path'])
+        self.assertEqual(50, record['offset'])
+
+        uploader.resume()
+        self.assertEqual(('/src.bin', self.data), client.committed[-1])
+
+    def test_mapped_file_upload_is_journaled(self):
+        client = FakeUploadClient(fail_at=150)
+        uploader = ChunkedUploader(client, chunk_size=50, max_workers=1, journal=self.journal)
+        with MappedFile(self.source) as f:
+            self.assertRaises(IOError, uploader.upload, f, 'r1', '/src.bin', 1000)
+
+        record = self.journal.load()
+        self.assertEqual(os.path.abspath(self.source), record['source']['path'])
+        self.assertEqual(150, record['offset'])
+        uploader.resume()
+        self.assertEqual([('/src.bin', self.data)], client.committed)
+
+
+class FakeRangeResponse(object):
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+        self.position = 0
+
+    def readinto(self, b):
+        if self.fail_after is not None and self.position >= self.fail_after:
+            raise urllib3.exceptions.ProtocolError("connection broken")
+        end = len(self.data) if self.fail_after is None else min(len(self.data), self.fail_after)
+        n = min(len(b), end - self.position, 7)
+        b[:n] = self.data[self.position:self.position + n]
+        self.position += n
+        return n
+
+    def close(self):
+        pass
+
+
+class FakeDownloadClient(object):
+    def __init__(self, data, failures=()):
+        self.data = data
+        self.failures = list(failures)
+        self.requests = 0
+
+    def get_meta(self, root_id, full_path):
+        return {'path': full_path, 'bytes': len(self.data), 'version': 1}
+
+    def get_file_by_path(self, root_id, full_path, version=None, offset=None, bytes_=None):
+        self.requests += 1
+        failure = self.failures.pop(0) if self.failures else None
+        if isinstance(failure, Exception):
+            raise failure
+        return FakeRangeResponse(self.data[offset:offset + bytes_], failure)
+
+
+class RangedDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dest = os.path.join(self.tmpdir, 'dest.bin')
+        self.data = os.urandom(100)
+        self.seen = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _downloader(self, client, retries=3):
+        return RangedDownloader(client, range_size=40, max_workers=1, retries=retries,
+                                progress=lambda stats: self.seen.append(stats.transferred))
+
+    def test_broken_range_is_refetched_without_double_counting(self):
+        client = FakeDownloadClient(self.data, failures=[None, 25])
+        self._downloader(client).download('r1', '/f', self.dest)
+
+        with open(self.dest, 'rb') as f:
+            self.assertEqual(self.data, f.read())
+        self.assertEqual(4, client.requests)
+        self.assertLessEqual(max(self.seen), len(self.data))
+        self.assertEqual(len(self.data), self.seen[-1])
+
+    def test_broken_range_gives_up_after_retries(self):
+        client = FakeDownloadClient(self.data[:40], failures=[10, 10])
+        self.assertRaises(IncompleteRangeError, self._downloader(client, retries=1).download,
+                          'r1', '/f', self.dest)
+        self.assertEqual(2, client.requests)
+
+    def test_failed_requests_are_left_to_the_retry_policy(self):
+        client = FakeDownloadClient(self.data, failures=[RESTSocketError('host', 'reset')])
+        self.assertRaises(RESTSocketError, self._downloader(client).download, 'r1', '/f', self.dest)
+        self.assertEqual(1, client.requests)
+
+
+if __name__ == '__main__':
+    unittest.main()
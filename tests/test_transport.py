@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from banmayun.rest import RESTClientObject
+from banmayun.transport import HTTP2Transport, create_ssl_context, httpx
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        reused = getattr(self.connection, 'session_reused', None)
+        self.server.reused.append(reused)
+        body = json.dumps({'path': self.path, 'reused': reused}).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve(server_context=None):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.reused = []
+    if server_context is not None:
+        server.socket = server_context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@unittest.skipUnless(shutil.which('openssl'), "needs the openssl command to create a test certificate")
+class TLSSessionResumptionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.cert = os.path.join(cls.tmpdir, 'cert.pem')
+        cls.key = os.path.join(cls.tmpdir, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                        '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                        '-keyout', cls.key, '-out', cls.cert],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def _requests(self, maximum_version):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.maximum_version = maximum_version
+        server_context.load_cert_chain(self.cert, self.key)
+        server = _serve(server_context)
+        try:
+            url = 'https://localhost:%d/x' % server.server_address[1]
+            client = RESTClientObject(ssl_context=create_ssl_context(cafile=self.cert), keep_alive=False)
+            try:
+                for _ in range(3):
+                    client.GET(url)
+            finally:
+                client.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+        return server.reused
+
+    def test_sessions_resume_with_tls12(self):
+        self.assertEqual([False, True, True], self._requests(ssl.TLSVersion.TLSv1_2))
+
+    def test_sessions_resume_with_tls13(self):
+        self.assertEqual([False, True, True], self._requests(ssl.TLSVersion.TLSv1_3))
+
+
+@unittest.skipIf(httpx is None, "HTTP2Transport needs httpx")
+class HTTP2TransportTest(unittest.TestCase):
+    def setUp(self):
+        self.server = _serve()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_requests_go_through_the_transport(self):
+        client = RESTClientObject(transport=HTTP2Transport(http2=False))
+        try:
+            self.assertEqual('/a?b=1', client.GET(self.url + '/a?b=1')['path'])
+
+            r = client.GET(self.url + '/raw', raw_response=True)
+            buf = bytearray(4)
+            self.assertEqual(4, r.readinto(buf))
+            self.assertEqual(b'{"pa', bytes(buf))
+            self.assertEqual(b'th"', r.read(3))
+        finally:
+            client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()